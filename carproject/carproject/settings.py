@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -51,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.middleware.QueryInstrumentationMiddleware',
+    'store.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,13 +88,55 @@ WSGI_APPLICATION = 'carproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+SQLITE_NAME = os.getenv('SQLITE_NAME', BASE_DIR / 'db.sqlite3')
+
+DATABASE_PROFILES = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': SQLITE_NAME,
+    },
+    'sqlite-wal': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_NAME,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB', 'carproject'),
+        'USER': os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {'min_size': 2, 'max_size': 10, 'timeout': 10},
+        },
+    },
 }
 
+DB_PROFILE = os.getenv('DB_PROFILE', 'sqlite')
+
+DATABASES = {
+    'default': DATABASE_PROFILES[DB_PROFILE],
+}
+
+DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ['store.routers.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -155,10 +200,26 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 2,
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'store.authentication.CachedJWTAuthentication',
+    ),
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'store.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'store.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# MessagePack (Accept: application/msgpack) for the mobile apps, when msgpack is installed
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('store.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('store.renderers.MessagePackParser')
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=10),
@@ -166,4 +227,52 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": False,
     "UPDATE_LAST_LOGIN": False,
-}
\ No newline at end of file
+    "TOKEN_REFRESH_SERIALIZER": "store.tokens.TokenRefreshSerializer",
+}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+STORE_RESPONSE_CACHE_TIMEOUT = 300
+
+STORE_FACETS_CACHE_TIMEOUT = 300
+
+STORE_IMAGE_WORKERS = 2
+
+STORE_EXPORT_CHUNK_SIZE = 2000
+
+STORE_NESTED_PAGE_SIZE = 10
+
+STORE_HISTORY_BATCH_SIZE = 100
+
+STORE_HISTORY_FLUSH_INTERVAL = 5
+
+STORE_HISTORY_DEDUPE_SECONDS = 300
+
+STORE_AUTH_CACHE_TIMEOUT = 300
+
+STORE_AUTH_LOCAL_TTL = 5
+
+STORE_BLACKLIST_BLOOM_BITS = 2 ** 20
+
+STORE_BLACKLIST_BLOOM_HASHES = 7
+
+STORE_BLACKLIST_BLOOM_REFRESH = 300
+
+STORE_BLACKLIST_BLOOM_OVERLAP = 60
+
+STORE_REPLICA_STICKY_SECONDS = 5
+
+STORE_SQL_INSTRUMENTATION = os.getenv('STORE_SQL_INSTRUMENTATION') == '1'
+
+STORE_SLOW_REQUEST_MS = int(os.getenv('STORE_SLOW_REQUEST_MS', 500))
+
+STORE_SLOW_QUERY_COUNT = 5
+
+STORE_FACET_PRICE_BUCKETS = [0, 500000, 1000000, 2000000, 5000000]
+
+STORE_FACET_YEAR_BUCKETS = [0, 2000, 2010, 2015, 2020]
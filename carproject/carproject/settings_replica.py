@@ -0,0 +1,35 @@
+"""
+Settings with a second SQLite database standing in for a read replica.
+
+Used to exercise PrimaryReplicaRouter locally; the two files are not replicated, which
+lets ReplicaRoutingTests tell which database served a read. The whole suite runs under
+these settings, with routing only enabled in the tests that check it:
+
+    python manage.py test store --settings=carproject.settings_replica
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+    },
+}
+
+DATABASE_REPLICAS = ['replica']
+
+# read-your-writes markers have to be visible to every worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'carproject_cache'),
+    }
+}
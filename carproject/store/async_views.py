@@ -0,0 +1,184 @@
+"""
+Async versions of the catalog read endpoints, served under the async/ prefix.
+
+Under WSGI every request holds a worker thread from start to finish, so a worker serves
+as many concurrent requests as it has threads. Under ASGI these views run on the event
+loop and only the ORM calls leave it: Django 5.1's async ORM is `sync_to_async` with
+`thread_sensitive=True`, and the ASGI handler gives each request its own sync thread. A
+request therefore holds a thread only while a query runs, and a worker can keep many
+more requests in flight (waiting on the network, the cache or the database) than it
+has threads.
+
+Inside one request the queries still run one at a time on that request's thread:
+`asyncio.gather` over the page and count, or over independent prefetches, removes the
+event-loop round trips between them but does not run them in parallel on the current
+database backends. Cursor pagination (`?pagination=cursor`) is served by the sync view
+in a thread, and so are the bounded nested pages of the make, model and category details.
+
+Like the sync views, every request goes through DRF's authentication, permission and
+throttle checks and content negotiation, responses share their response cache, and car
+details are recorded in History.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch, aprefetch_related_objects
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .cache import CachedResponseMixin, get_cache, get_fresh, get_tag_versions
+from .history import recorder
+from .models import CarReview
+from .pagination import CarCursorPagination
+from .views import (
+    CarListAPIView, CarDetailAPIView, CategoryListAPIView, CategoryDetailAPIView,
+    CarMakeLisAPIView, CarMakeDetailAPIView, CarModelListAPIView, CarModelDetailAPIView,
+)
+
+
+def build_view(view_class, request, **kwargs):
+    view = view_class()
+    view.setup(request, **kwargs)
+    view.request = view.initialize_request(request, **kwargs)
+    view.headers = view.default_response_headers
+    return view
+
+
+async def render(view, response):
+    """Negotiate and render a DRF response the way the sync view would, as a plain HttpResponse."""
+    response = view.finalize_response(view.request, response)
+    if isinstance(response.accepted_renderer, BrowsableAPIRenderer):
+        # the browsable API builds its forms from the database
+        content = await sync_to_async(lambda: response.rendered_content)()
+    else:
+        content = response.rendered_content
+    return HttpResponse(content, status=response.status_code, headers=dict(response.items()))
+
+
+async def respond(view, compute):
+    """
+    Run the view's authentication, permission, throttling and content negotiation, then
+    serve the data of `compute()` through its response cache when it has one. Unlike the
+    sync views, concurrent misses are not single-flighted.
+    """
+    try:
+        await sync_to_async(view.initial)(view.request)
+        timeout = view.get_cache_timeout() if isinstance(view, CachedResponseMixin) else None
+        if not timeout:
+            return await render(view, Response(await compute()))
+        key = view.get_cache_key(view.request)
+        entry = await sync_to_async(get_fresh)(key)
+        if entry is None:
+            tags = await sync_to_async(get_tag_versions)(view.get_cache_tags())
+            data = await compute()
+            entry = await sync_to_async(view.make_cache_entry)(data, tags)
+            if entry is None:
+                return await render(view, Response(data))
+            await get_cache().aset(key, entry, timeout)
+        return await render(view, Response(entry['data']))
+    except (APIException, Http404) as exc:
+        return await render(view, view.handle_exception(exc))
+
+
+async def listing(request, view_class, *prefetches):
+    view = build_view(view_class, request)
+    if CarCursorPagination.is_requested(view.request):
+        return await sync_to_async(view_class.as_view())(request)
+
+    async def compute():
+        context = view.get_serializer_context()
+        queryset = await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+        paginator = LimitOffsetPagination()
+        paginator.request = view.request
+        paginator.limit = paginator.get_limit(view.request)
+        paginator.offset = paginator.get_offset(view.request)
+        page = queryset.prefetch_related(None)[paginator.offset:paginator.offset + paginator.limit]
+
+        async def fetch_page():
+            objects = [obj async for obj in page]
+            await asyncio.gather(*(aprefetch_related_objects(objects, lookup) for lookup in prefetches))
+            return objects
+
+        paginator.count, objects = await asyncio.gather(queryset.acount(), fetch_page())
+        return {
+            'count': paginator.count,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': view.get_serializer_class()(objects, many=True, context=context).data,
+        }
+
+    return await respond(view, compute)
+
+
+async def get_object(view, queryset, pk):
+    obj = await queryset.filter(pk=pk).afirst()
+    if obj is None:
+        raise Http404(f'No {view.queryset.model._meta.object_name} matches the given query.')
+    await sync_to_async(view.check_object_permissions)(view.request, obj)
+    view.object = obj
+    return obj
+
+
+async def detail(request, view_class, pk, *prefetches):
+    view = build_view(view_class, request, pk=pk)
+
+    async def compute():
+        context = view.get_serializer_context()
+        obj = await get_object(view, view.get_queryset().prefetch_related(None), pk)
+        await asyncio.gather(*(aprefetch_related_objects([obj], lookup) for lookup in prefetches))
+        return view.get_serializer_class()(obj, context=context).data
+
+    return await respond(view, compute)
+
+
+async def nested_detail(request, view_class, pk):
+    view = build_view(view_class, request, pk=pk)
+
+    async def compute():
+        context = view.get_serializer_context()
+        obj = await get_object(view, view.get_queryset(), pk)
+        return await sync_to_async(lambda: view.get_serializer_class()(obj, context=context).data)()
+
+    return await respond(view, compute)
+
+
+async def car_list(request):
+    return await listing(request, CarListAPIView, 'car_images')
+
+
+async def car_detail(request, pk):
+    response = await detail(
+        request, CarDetailAPIView, pk,
+        'car_images', Prefetch('car_review', queryset=CarReview.objects.select_related('user')),
+    )
+    # DRF has authenticated the request by now, and set its user on the Django request
+    if response.status_code == 200 and request.user.is_authenticated:
+        await sync_to_async(recorder.record)(request.user.pk, pk)
+    return response
+
+
+async def category_list(request):
+    return await listing(request, CategoryListAPIView)
+
+
+async def category_detail(request, pk):
+    return await nested_detail(request, CategoryDetailAPIView, pk)
+
+
+async def car_make_list(request):
+    return await listing(request, CarMakeLisAPIView)
+
+
+async def car_make_detail(request, pk):
+    return await nested_detail(request, CarMakeDetailAPIView, pk)
+
+
+async def car_model_list(request):
+    return await listing(request, CarModelListAPIView)
+
+
+async def car_model_detail(request, pk):
+    return await nested_detail(request, CarModelDetailAPIView, pk)
@@ -0,0 +1,100 @@
+import copy
+import time
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import get_cache, get_tag_versions, invalidate_tags
+from .models import UserProfile
+from .routers import get_replicas, is_recent_writer, use_primary
+
+
+_local = {}
+_local_lock = Lock()
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+def load_user(user_id):
+    """The concrete Client or Owner for `user_id` in one query, or the plain UserProfile."""
+    users = UserProfile.objects.db_manager(router.db_for_write(UserProfile))
+    user = users.select_related('client', 'owner').filter(pk=user_id).first()
+    if user is None:
+        return None
+    for child in ['client', 'owner']:
+        try:
+            return getattr(user, child)
+        except ObjectDoesNotExist:
+            pass
+    return user
+
+
+def get_cached_user(user_id):
+    """
+    Resolve a user through a per-process TTL cache, then the shared cache, then the database.
+
+    Shared entries are keyed by the user id and the current version of the `user:<id>` tag,
+    which the UserProfile save/delete signal bumps, so a saved profile, password or
+    is_active flag is picked up by every process once its local entry (at most
+    STORE_AUTH_LOCAL_TTL seconds old) expires. The local entry of the current process
+    is dropped immediately.
+    """
+    now = time.monotonic()
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > now:
+        return copy.copy(entry[1])
+
+    version = get_tag_versions([user_tag(user_id)])[user_tag(user_id)]
+    key = f'store:auth:{user_id}:{version}'
+    cache = get_cache()
+    user = cache.get(key)
+    if user is None:
+        user = load_user(user_id)
+        if user is None:
+            return None
+        cache.set(key, user, getattr(settings, 'STORE_AUTH_CACHE_TIMEOUT', 300))
+
+    with _local_lock:
+        _local[user_id] = (now + getattr(settings, 'STORE_AUTH_LOCAL_TTL', 5), user)
+    return copy.copy(user)
+
+
+def invalidate_user(user_id):
+    with _local_lock:
+        _local.pop(user_id, None)
+    invalidate_tags(user_tag(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the concrete Client/Owner without a query in steady state."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if get_replicas() and is_recent_writer(user.pk):
+            use_primary()
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
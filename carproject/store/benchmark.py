@@ -0,0 +1,310 @@
+import json
+import math
+import platform
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from rest_framework.test import APIClient
+
+from .models import Category, CarMake, CarModel, Car, CarImage, CarReview, Client
+from .importer import CarImporter
+from .ratings import rebuild_ratings
+
+
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark-pass-123'
+
+MAKES = {
+    'BMW': ['X5', '320i', 'M3'],
+    'Toyota': ['Camry', 'Corolla', 'RAV4'],
+    'Honda': ['Civic', 'Accord', 'CR-V'],
+    'Lexus': ['RX350', 'LX570'],
+    'Hyundai': ['Sonata', 'Tucson'],
+}
+CATEGORIES = ['Седан', 'Кроссовер', 'Внедорожник']
+BODIES = ['седан', 'внедорожник', 'универсал', 'минивен']
+FUELS = ['бензин', 'дизель', 'гибрид', 'электро', 'бензин|газ']
+WORDS = ['надежный', 'экономичный', 'комфортный', 'полный привод', 'кожаный салон', 'один владелец']
+
+
+def seed(cars=500, seed_value=42):
+    """Fill the current database with a deterministic catalog plus a benchmark client."""
+    rng = random.Random(seed_value)
+    rows = []
+    for i in range(cars):
+        make = rng.choice(list(MAKES))
+        rows.append({
+            'external_id': f'bench-{i}',
+            'make': make,
+            'model': rng.choice(MAKES[make]),
+            'category': rng.choice(CATEGORIES),
+            'description': ' '.join(rng.sample(WORDS, 3)),
+            'price': str(Decimal(rng.randrange(500000, 8000000)) / 100),
+            'year': rng.randrange(2005, 2025),
+            'body': rng.choice(BODIES),
+            'fuel': rng.choice(FUELS),
+            'gearbox': rng.choice(['механика', 'автомат']),
+        })
+    CarImporter(batch_size=500).run(rows)
+
+    user = Client.objects.filter(username=BENCHMARK_USERNAME).first()
+    if user is None:
+        user = Client.objects.create_user(username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD)
+    reviewers = [user] + [
+        Client.objects.get_or_create(username=f'benchmark{i}', defaults={'first_name': f'Reviewer {i}'})[0]
+        for i in range(4)
+    ]
+    car_ids = list(Car.objects.filter(external_id__startswith='bench-').values_list('pk', flat=True))
+    CarImage.objects.bulk_create(
+        CarImage(car_id=pk, image=f'car_images/bench_{pk}_{j}.jpeg') for pk in car_ids for j in range(3)
+    )
+    CarReview.objects.bulk_create(
+        CarReview(car_id=pk, user=reviewer, text='ok', stars=rng.randint(1, 5))
+        for pk in car_ids for reviewer in rng.sample(reviewers, rng.randint(0, 3))
+    )
+    rebuild_ratings()
+    return user
+
+
+class Fixture:
+    """Ids and credentials the scenarios draw from, read from the database the server uses."""
+
+    def __init__(self, username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD):
+        self.username = username
+        self.password = password
+        self.car_ids = list(Car.objects.order_by('pk').values_list('pk', flat=True)[:200])
+        self.make_ids = list(CarMake.objects.order_by('pk').values_list('pk', flat=True))
+        self.model_ids = list(CarModel.objects.order_by('pk').values_list('pk', flat=True))
+        self.category_ids = list(Category.objects.order_by('pk').values_list('pk', flat=True))
+        self.make_names = list(CarMake.objects.order_by('pk').values_list('car_name', flat=True))
+        self.access = self.refresh = None
+
+    def pick(self, values, i):
+        return values[i % len(values)]
+
+    def url(self, name, *args, query=None):
+        with translation.override(settings.LANGUAGE_CODE):
+            path = reverse(name, args=args)
+        if query:
+            path = f'{path}?{urlencode(query)}'
+        return path
+
+
+def car_list(fx, i):
+    return 'GET', fx.url('car_list'), None, False
+
+
+def car_list_filtered(fx, i):
+    return 'GET', fx.url('car_list', query={'price__gt': 20000, 'year__gt': 2012, 'rating__gt': 2}), None, False
+
+
+def car_list_by_make(fx, i):
+    return 'GET', fx.url('car_list', query={'car_make': fx.pick(fx.make_ids, i)}), None, False
+
+
+def car_list_search(fx, i):
+    return 'GET', fx.url('car_list', query={'search': fx.pick(fx.make_names, i)}), None, False
+
+
+def car_list_ordered(fx, i):
+    ordering = ['price', '-price', '-rating', '-review_count'][i % 4]
+    return 'GET', fx.url('car_list', query={'ordering': ordering, 'offset': 40}), None, False
+
+
+def car_list_cursor(fx, i):
+    return 'GET', fx.url('car_list', query={'pagination': 'cursor', 'ordering': 'price'}), None, False
+
+
+def car_detail(fx, i):
+    return 'GET', fx.url('car_detail', fx.pick(fx.car_ids, i)), None, False
+
+
+def car_make_list(fx, i):
+    return 'GET', fx.url('car_make_list'), None, False
+
+
+def car_make_detail(fx, i):
+    return 'GET', fx.url('car_make_detail', fx.pick(fx.make_ids, i)), None, False
+
+
+def car_model_detail(fx, i):
+    return 'GET', fx.url('car_model_detail', fx.pick(fx.model_ids, i)), None, False
+
+
+def category_list(fx, i):
+    return 'GET', fx.url('category_list'), None, False
+
+
+def category_detail(fx, i):
+    return 'GET', fx.url('category_detail', fx.pick(fx.category_ids, i)), None, False
+
+
+def login(fx, i):
+    return 'POST', fx.url('login'), {'username': fx.username, 'password': fx.password}, False
+
+
+def token_refresh(fx, i):
+    return 'POST', fx.url('token_refresh'), {'refresh': fx.refresh}, False
+
+
+def cart(fx, i):
+    return 'GET', fx.url('cart_list'), None, True
+
+
+def cart_batch(fx, i):
+    cars = [fx.pick(fx.car_ids, i + offset) for offset in range(3)]
+    data = {'add': cars} if i % 2 == 0 else {'remove': cars}
+    return 'POST', fx.url('cart_batch'), data, True
+
+
+SCENARIOS = {
+    scenario.__name__: scenario for scenario in [
+        car_list, car_list_filtered, car_list_by_make, car_list_search, car_list_ordered, car_list_cursor,
+        car_detail, car_make_list, car_make_detail, car_model_detail, category_list, category_detail,
+        login, token_refresh, cart, cart_batch,
+    ]
+}
+
+AUTH_SCENARIOS = {'login', 'token_refresh', 'cart', 'cart_batch'}
+
+
+class InProcessTransport:
+    """Send requests through Django's test client and count the SQL each one runs."""
+
+    def __init__(self):
+        self.client = APIClient()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.generic(method, path, json.dumps(data) if data is not None else '',
+                                           content_type='application/json', **headers)
+        body = response.content if not response.streaming else b''.join(response.streaming_content)
+        return response.status_code, body, len(queries)
+
+
+class HTTPTransport:
+    """Send requests to a running server. SQL counts are not visible from outside, so they are None."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, data=None, token=None):
+        request = urllib.request.Request(
+            self.base_url + path, method=method,
+            data=json.dumps(data).encode() if data is not None else None,
+            headers={'Content-Type': 'application/json', **({'Authorization': f'Bearer {token}'} if token else {})},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read(), None
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read(), None
+
+
+def authenticate(transport, fixture):
+    status, body, _ = transport.request(*login(fixture, 0)[:3])
+    if status != 200:
+        return False
+    tokens = json.loads(body)
+    fixture.access, fixture.refresh = tokens['access'], tokens['refresh']
+    return True
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_scenario(transport, fixture, scenario, requests=50, warmup=5, concurrency=1):
+    def call(i):
+        method, path, data, auth = scenario(fixture, i)
+        started = time.perf_counter()
+        status, _, queries = transport.request(method, path, data, fixture.access if auth else None)
+        return time.perf_counter() - started, status, queries
+
+    for i in range(warmup):
+        call(i)
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(call, range(warmup, warmup + requests)))
+    else:
+        results = [call(i) for i in range(warmup, warmup + requests)]
+    elapsed = time.perf_counter() - started
+
+    latencies = [duration * 1000 for duration, _, _ in results]
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'requests': requests,
+        'errors': sum(1 for _, status, _ in results if status >= 400),
+        'throughput': round(requests / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def run_benchmark(transport, fixture, names=None, requests=50, warmup=5, concurrency=1, on_result=None):
+    names = names or list(SCENARIOS)
+    results = {}
+    authenticated = authenticate(transport, fixture) if AUTH_SCENARIOS.intersection(names) else False
+    for name in names:
+        if name in AUTH_SCENARIOS and not authenticated:
+            continue
+        results[name] = run_scenario(transport, fixture, SCENARIOS[name], requests, warmup, concurrency)
+        if on_result:
+            on_result(name, results[name])
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests': requests,
+            'warmup': warmup,
+            'concurrency': concurrency,
+        },
+        'scenarios': results,
+    }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Regressions of `current` against `baseline`, as human-readable lines.
+
+    Latency may grow by `tolerance` (a fraction) before it counts; SQL queries per
+    request and error counts may not grow at all.
+    """
+    regressions = []
+    for name, new in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        for metric in ['p50_ms', 'p95_ms']:
+            if old[metric] and new[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {old[metric]} -> {new[metric]}')
+        if old['max_queries'] is not None and new['max_queries'] is not None \
+                and new['max_queries'] > old['max_queries']:
+            regressions.append(f'{name}: queries {old["max_queries"]} -> {new["max_queries"]}')
+        if new['errors'] > old['errors']:
+            regressions.append(f'{name}: errors {old["errors"]} -> {new["errors"]}')
+    return regressions
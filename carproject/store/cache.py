@@ -0,0 +1,157 @@
+import hashlib
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import get_language
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import routers
+
+
+def get_cache():
+    return caches[getattr(settings, 'STORE_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def tag_key(tag):
+    return f'store:tag:{tag}'
+
+
+def new_version():
+    return f'{time.time():.3f}:{uuid4().hex}'
+
+
+def changed_within(versions, seconds):
+    """Whether any of the tag `versions` was minted or bumped in the last `seconds`."""
+    horizon = time.time() - seconds
+    return any(float(version.partition(':')[0]) > horizon for version in versions.values())
+
+
+def get_tag_versions(tags):
+    """Current version of every tag, minting a version for tags that have none yet."""
+    cache = get_cache()
+    keys = {tag: tag_key(tag) for tag in tags}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for tag, key in keys.items():
+        if key not in found:
+            cache.add(key, new_version(), None)
+            found[key] = cache.get(key)
+        versions[tag] = found[key]
+    return versions
+
+
+def invalidate_tags(*tags):
+    tags = {tag for tag in tags if tag}
+    if tags:
+        get_cache().set_many({tag_key(tag): new_version() for tag in tags}, None)
+
+
+def is_fresh(entry):
+    versions = entry['tags']
+    current = get_cache().get_many([tag_key(tag) for tag in versions])
+    return all(current.get(tag_key(tag)) == version for tag, version in versions.items())
+
+
+def get_fresh(key):
+    entry = get_cache().get(key)
+    if entry is not None and is_fresh(entry):
+        return entry
+    return None
+
+
+def single_flight(key, compute, timeout, lock_timeout=10, wait=5):
+    """
+    Return the fresh entry at `key`, computing it at most once across workers when it is missing.
+
+    The worker that wins the lock computes and stores the entry; the others poll for it
+    and compute it themselves if the winner releases the lock without storing one (the
+    response was not cacheable) or takes longer than `wait` seconds.
+    """
+    cache = get_cache()
+    entry = get_fresh(key)
+    if entry is not None:
+        return entry
+
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, lock_timeout):
+        try:
+            entry = compute()
+            if entry is not None:
+                cache.set(key, entry, timeout)
+            return entry
+        finally:
+            cache.delete(lock)
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = get_fresh(key)
+        if entry is not None:
+            return entry
+        if cache.get(lock) is None:
+            break
+    return compute()
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses per language, host and query string.
+
+    Every entry records the versions of the tags it depends on: `cache_tags` (formatted
+    with the URL kwargs) plus whatever `get_dependency_tags` finds in the served object.
+    Signal handlers bump tag versions on writes, which makes dependent entries stale.
+    Responses read from a replica are not stored while one of their tags changed within
+    the replica stickiness window, since the replica may not have the change yet.
+    """
+    cache_tags = ()
+    cache_timeout = None
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, 'STORE_RESPONSE_CACHE_TIMEOUT', 300)
+
+    def get_cache_key(self, request):
+        params = sorted(request.query_params.lists())
+        digest = hashlib.md5(repr((request.scheme, request.get_host(), params, sorted(self.kwargs.items()))).encode())
+        return f'store:response:{type(self).__name__}:{get_language()}:{digest.hexdigest()}'
+
+    def get_cache_tags(self):
+        return [tag.format(**self.kwargs) for tag in self.cache_tags]
+
+    def get_dependency_tags(self):
+        return []
+
+    def make_cache_entry(self, data, tags):
+        """The entry storing `data`, computed under the versions `tags`; None when it must not be stored."""
+        tags.update(get_tag_versions(self.get_dependency_tags()))
+        if routers.replica_reads_active() and changed_within(tags, routers.get_sticky_seconds()):
+            return None
+        return {'data': data, 'tags': tags}
+
+    def get_object(self):
+        self.object = super().get_object()
+        return self.object
+
+    def get(self, request, *args, **kwargs):
+        timeout = self.get_cache_timeout()
+        if not timeout:
+            return super().get(request, *args, **kwargs)
+
+        response = None
+
+        def compute():
+            nonlocal response
+            tags = get_tag_versions(self.get_cache_tags())
+            response = super(CachedResponseMixin, self).get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return None
+            return self.make_cache_entry(response.data, tags)
+
+        entry = single_flight(self.get_cache_key(request), compute, timeout)
+        if response is not None:
+            return response
+        return Response(entry['data'])
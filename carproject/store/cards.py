@@ -0,0 +1,118 @@
+"""
+Pre-rendered car cards: the CarListSerializer JSON of every car, stored per language.
+
+A card is rendered once, with image URLs relative to HOST_PLACEHOLDER, and the car list
+splices the stored cards of a page into the response instead of serializing the cars,
+their makes, models and images on every request. Cards are rebuilt after a car or its
+images change and dropped when its make or model changes or cars are imported in bulk;
+a missing card is rendered on first read. `manage.py rebuild_car_cards` renders them all.
+"""
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import router, transaction
+from django.http import QueryDict
+from django.utils import timezone, translation
+from rest_framework.renderers import JSONRenderer
+
+from .models import Car, CarCard
+from .renderers import ORJSONRenderer
+from .values import CarListValuesSerializer
+
+
+HOST_PLACEHOLDER = '{store:host}'
+
+RESULTS_PLACEHOLDER = '{store:cards}'
+
+
+class CardRequest:
+    """The part of a request CarListSerializer uses, with default query parameters."""
+
+    query_params = QueryDict()
+
+    def build_absolute_uri(self, location):
+        if urlsplit(location).scheme:
+            return location
+        return HOST_PLACEHOLDER + location
+
+
+class CardList(list):
+    """Rendered card bodies, which CarCardRenderer inserts into the response verbatim."""
+
+
+def render_cards(queryset):
+    serializer = CarListValuesSerializer(context={'request': CardRequest()})
+    renderer = ORJSONRenderer()
+    cards = serializer.to_representation(serializer.rows(queryset))
+    return {card['id']: renderer.render(card).decode() for card in cards}
+
+
+def save_cards(cards, language):
+    now = timezone.now()
+    CarCard.objects.bulk_create(
+        [CarCard(car_id=car_id, language=language, body=body, updated_at=now) for car_id, body in cards.items()],
+        update_conflicts=True, unique_fields=['car', 'language'], update_fields=['body', 'updated_at'],
+    )
+
+
+def rebuild_cards(car_ids=None, languages=None, batch_size=500):
+    """Render and store the cards of `car_ids` (all cars by default); returns the number of cars."""
+    languages = languages or [code for code, name in settings.LANGUAGES]
+    queryset = Car.objects.order_by('pk')
+    if car_ids is not None:
+        queryset = queryset.filter(pk__in=list(car_ids))
+    rebuilt, last_pk = 0, 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return rebuilt
+        for language in languages:
+            with translation.override(language):
+                save_cards(render_cards(Car.objects.filter(pk__in=batch)), language)
+        rebuilt += len(batch)
+        last_pk = batch[-1]
+
+
+def get_cards(car_ids, language):
+    """The card bodies of `car_ids` in order, rendering and storing the missing ones."""
+    cards = dict(CarCard.objects.filter(car_id__in=car_ids, language=language).values_list('car_id', 'body'))
+    missing = [pk for pk in car_ids if pk not in cards]
+    if missing:
+        with translation.override(language):
+            rendered = render_cards(Car.objects.using(router.db_for_write(Car)).filter(pk__in=missing))
+        save_cards(rendered, language)
+        cards.update(rendered)
+    return CardList(cards[pk] for pk in car_ids if pk in cards)
+
+
+def invalidate_cards(car_ids):
+    CarCard.objects.filter(car_id__in=[pk for pk in car_ids if pk]).delete()
+
+
+def refresh_cards(car_ids):
+    """Drop the cards of `car_ids` now and render them again once the transaction commits."""
+    car_ids = [pk for pk in car_ids if pk]
+    invalidate_cards(car_ids)
+    transaction.on_commit(lambda: rebuild_cards(car_ids))
+
+
+class CarCardRenderer(ORJSONRenderer):
+    """ORJSONRenderer that writes a CardList of `results` as stored, filling in the request host."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        cards = data.get('results') if isinstance(data, dict) else None
+        if not isinstance(cards, CardList):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        placeholder = super().render(RESULTS_PLACEHOLDER)
+        body = super().render({**data, 'results': RESULTS_PLACEHOLDER}, accepted_media_type, renderer_context)
+        results = f'[{",".join(cards)}]'
+        request = (renderer_context or {}).get('request')
+        if request is not None:
+            results = results.replace(HOST_PLACEHOLDER, request.build_absolute_uri('/')[:-1])
+        return body.replace(placeholder, results.encode(), 1)
+
+
+def with_card_renderer(renderer_classes):
+    """`renderer_classes` with CarCardRenderer first in place of the JSON renderer."""
+    return [CarCardRenderer, *(renderer for renderer in renderer_classes if not issubclass(renderer, JSONRenderer))]
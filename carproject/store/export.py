@@ -0,0 +1,77 @@
+import csv
+import json
+
+from rest_framework import serializers
+
+from .fields import flags_representation
+
+
+EXPORT_FIELDS = [
+    'id', 'external_id', 'car_make', 'car_model', 'year', 'price', 'body', 'fuel', 'rudder',
+    'gearbox', 'color', 'description_ru', 'description_en', 'review_count', 'avg_rating',
+    'images', 'date_registered',
+]
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+price_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+date_field = serializers.DateTimeField()
+
+
+def export_queryset(queryset):
+    return queryset.select_related('car_make', 'car_model').prefetch_related('car_images').order_by('pk')
+
+
+def export_rows(queryset, build_url=None, chunk_size=2000):
+    """Yield one plain dict per car, holding at most `chunk_size` cars and their images in memory."""
+    for car in queryset.iterator(chunk_size=chunk_size):
+        images = [image.image.url for image in car.car_images.all() if image.image]
+        if build_url is not None:
+            images = [build_url(url) for url in images]
+        yield {
+            'id': car.pk,
+            'external_id': car.external_id,
+            'car_make': car.car_make.car_name,
+            'car_model': car.car_model.car_model,
+            'year': car.year,
+            'price': price_field.to_representation(car.price),
+            'body': car.body,
+            'fuel': flags_representation(car.fuel),
+            'rudder': car.rudder,
+            'gearbox': car.gearbox,
+            'color': car.color,
+            'description_ru': car.description_ru,
+            'description_en': car.description_en,
+            'review_count': car.review_count,
+            'avg_rating': car.get_avg_rating(),
+            'images': images,
+            'date_registered': date_field.to_representation(car.date_registered),
+        }
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['fuel'] = row['fuel'] if isinstance(row['fuel'], str) else '|'.join(row['fuel'])
+        row['images'] = ' '.join(row['images'])
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+WRITERS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from rest_framework import serializers
+
+from .models import Car
+
+
+FACETS_CACHE_KEY = 'store:car_facets'
+
+CHOICE_FACETS = {
+    'body': Car.BODY_CHOICES,
+    'fuel': Car.FUEL_CHOICES,
+    'rudder': Car.RUDDER_CHOICES,
+    'gearbox': Car.GEARBOX_CHOICES,
+    'color': Car.COLOR_CHOICES,
+}
+
+MULTIPLE_CHOICE_FACETS = {'fuel'}
+
+price_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def choice_lookup(field, value):
+    if field in MULTIPLE_CHOICE_FACETS:
+        return Q(**{f'{field}__in': Car._meta.get_field(field).masks(any_of=[value])})
+    return Q(**{field: value})
+
+
+def range_lookup(field, lower, upper):
+    lookup = Q(**{f'{field}__gte': lower})
+    if upper is not None:
+        lookup &= Q(**{f'{field}__lt': upper})
+    return lookup
+
+
+def bucket_bounds(edges):
+    return list(zip(edges, [*edges[1:], None]))
+
+
+def get_price_buckets():
+    return getattr(settings, 'STORE_FACET_PRICE_BUCKETS', [0, 500000, 1000000, 2000000, 5000000])
+
+
+def get_year_buckets():
+    return getattr(settings, 'STORE_FACET_YEAR_BUCKETS', [0, 2000, 2010, 2015, 2020])
+
+
+def compute_facets(queryset):
+    """Count every facet value and histogram bucket of `queryset` in a single aggregate query."""
+    choices = {field: list(dict.fromkeys(choices)) for field, choices in CHOICE_FACETS.items()}
+    ranges = {'price': bucket_bounds(get_price_buckets()), 'year': bucket_bounds(get_year_buckets())}
+
+    aggregates = {
+        'count': Count('id'),
+        'price_min': Min('price'), 'price_max': Max('price'),
+        'year_min': Min('year'), 'year_max': Max('year'),
+    }
+    for field, values in choices.items():
+        for index, (value, label) in enumerate(values):
+            aggregates[f'{field}_{index}'] = Count('id', filter=choice_lookup(field, value))
+    for field, bounds in ranges.items():
+        for index, (lower, upper) in enumerate(bounds):
+            aggregates[f'{field}_bucket_{index}'] = Count('id', filter=range_lookup(field, lower, upper))
+
+    result = queryset.order_by().aggregate(**aggregates)
+
+    facets = {'count': result['count']}
+    for field, values in choices.items():
+        facets[field] = [
+            {'value': value, 'label': label, 'count': result[f'{field}_{index}']}
+            for index, (value, label) in enumerate(values)
+        ]
+    for field, bounds in ranges.items():
+        represent = price_field.to_representation if field == 'price' else int
+        lowest, highest = result[f'{field}_min'], result[f'{field}_max']
+        facets[field] = {
+            'min': represent(lowest) if lowest is not None else None,
+            'max': represent(highest) if highest is not None else None,
+            'histogram': [
+                {
+                    'min': represent(lower),
+                    'max': represent(upper) if upper is not None else None,
+                    'count': result[f'{field}_bucket_{index}'],
+                }
+                for index, (lower, upper) in enumerate(bounds)
+            ],
+        }
+    return facets
+
+
+def get_cached_facets(queryset):
+    timeout = getattr(settings, 'STORE_FACETS_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return compute_facets(queryset)
+    facets = cache.get(FACETS_CACHE_KEY)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(FACETS_CACHE_KEY, facets, timeout)
+    return facets
+
+
+def invalidate_facets():
+    cache.delete(FACETS_CACHE_KEY)
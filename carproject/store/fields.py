@@ -0,0 +1,106 @@
+from django import forms
+from django.core import exceptions
+from django.db import models
+from rest_framework import serializers
+
+
+class BitmaskField(models.PositiveSmallIntegerField):
+    """
+    A subset of `choices` stored as an integer with one bit per choice.
+
+    The Python value is a list of choice values in declaration order, like the
+    MultiSelectField it replaces. Comma-separated strings are still accepted on
+    assignment. Use `masks()` to turn "any of" / "all of" conditions into a
+    `field__in` lookup, which an index on the column can serve.
+    """
+
+    def __init__(self, *args, flags=(), max_choices=None, **kwargs):
+        self.flags = [value for value, label in flags]
+        self.flag_choices = list(flags)
+        self.max_choices = max_choices
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['flags'] = self.flag_choices
+        if self.max_choices is not None:
+            kwargs['max_choices'] = self.max_choices
+        return name, path, args, kwargs
+
+    def decode(self, mask):
+        return [flag for bit, flag in enumerate(self.flags) if mask & (1 << bit)]
+
+    def encode(self, values):
+        mask = 0
+        for value in values:
+            try:
+                mask |= 1 << self.flags.index(value)
+            except ValueError:
+                raise exceptions.ValidationError(f'{value!r} is not a valid choice.', code='invalid_choice')
+        return mask
+
+    def masks(self, any_of=(), all_of=()):
+        """Every stored value with at least one bit of `any_of` and all bits of `all_of`."""
+        any_mask, all_mask = self.encode(any_of), self.encode(all_of)
+        return [
+            mask for mask in range(1 << len(self.flags))
+            if (not any_mask or mask & any_mask) and mask & all_mask == all_mask
+        ]
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        if isinstance(value, int):
+            return self.decode(value)
+        if isinstance(value, str):
+            if value.isdigit():
+                return self.decode(int(value))
+            return [item.strip() for item in value.split(',') if item.strip()]
+        return list(value)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else self.decode(value)
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        return self.encode(self.to_python(value))
+
+    def value_to_string(self, obj):
+        return str(self.get_prep_value(self.value_from_object(obj)))
+
+    def validate(self, value, model_instance):
+        if not value and not self.blank:
+            raise exceptions.ValidationError(self.error_messages['blank'], code='blank')
+        self.encode(value or [])
+        if self.max_choices is not None and len(value or []) > self.max_choices:
+            raise exceptions.ValidationError(f'Choose at most {self.max_choices}.', code='max_choices')
+
+    def run_validators(self, value):
+        super().run_validators(self.get_prep_value(value))
+
+    def formfield(self, **kwargs):
+        return forms.MultipleChoiceField(**{
+            'choices': self.flag_choices,
+            'required': not self.blank,
+            'label': self.verbose_name.capitalize(),
+            'help_text': self.help_text,
+            **kwargs,
+        })
+
+
+def flags_representation(values):
+    """A single value as is and several as a list, the shape MultiSelectField was serialized in."""
+    values = list(values)
+    return values[0] if len(values) == 1 else values
+
+
+class BitmaskSerializerField(serializers.MultipleChoiceField):
+    """Serializes a BitmaskField as its value, or a list of values in choice order when several are set."""
+
+    def to_representation(self, value):
+        return flags_representation(item for item in self.choices if item in value)
+
+    def to_internal_value(self, data):
+        values = super().to_internal_value([data] if isinstance(data, str) else data)
+        return [item for item in self.choices if item in values]
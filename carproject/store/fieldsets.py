@@ -0,0 +1,127 @@
+"""
+Sparse fieldsets and on-demand expansion of car representations.
+
+`?fields=id,price,car_make` keeps only the listed fields of every car in the response
+and `?expand=car_images` picks which relations (car_make, car_model, car_images,
+car_review) are embedded as objects; relations that are kept but not expanded are
+rendered as ids. Without `?expand=` every kept relation is expanded, so a request
+without either parameter gets the usual representation. Querysets built from a plan
+only join and prefetch what will be rendered and leave out unused description
+translations.
+"""
+from django.db.models import Prefetch
+from django.utils.translation import get_language
+from modeltranslation import settings as modeltranslation_settings
+from modeltranslation.utils import resolution_order
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .models import CarImage, CarReview
+
+
+# relation -> whether it is a to-many relation
+EXPANDABLE = {'car_make': False, 'car_model': False, 'car_images': True, 'car_review': True}
+
+
+def split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class CarFieldPlan:
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request, serializer_class):
+        """The plan asked for by `request`, or None when it has neither parameter."""
+        params = request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        available = list(serializer_class().get_fields())
+        plan = cls(
+            fields=split(params['fields']) if 'fields' in params else None,
+            expand=split(params['expand']) if 'expand' in params else None,
+        )
+        errors = {}
+        unknown = [name for name in plan.fields or [] if name not in available]
+        if unknown:
+            errors['fields'] = [f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(available)}']
+        expandable = [name for name in available if name in EXPANDABLE]
+        unknown = [name for name in plan.expand or [] if name not in expandable]
+        if unknown:
+            errors['expand'] = [f'Cannot expand: {", ".join(unknown)}. Expandable: {", ".join(expandable)}']
+        if errors:
+            raise ValidationError(errors)
+        return plan
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return self.includes(name) and (self.expand is None or name in self.expand)
+
+    def apply(self, fields):
+        """Filter the fields of a car serializer, replacing collapsed relations with primary keys."""
+        applied = {}
+        for name, field in fields.items():
+            if not self.includes(name):
+                continue
+            if name in EXPANDABLE and not self.expands(name):
+                field = serializers.PrimaryKeyRelatedField(
+                    read_only=True, many=EXPANDABLE[name], source=None if field.source == name else field.source,
+                )
+            applied[name] = field
+        return applied
+
+    def deferred_descriptions(self):
+        """The description columns (the base field and its translations) the response does not read."""
+        languages = modeltranslation_settings.AVAILABLE_LANGUAGES
+        if not self.includes('description'):
+            return ['description', *(f'description_{code}' for code in languages)]
+        needed = resolution_order(get_language())
+        return [f'description_{code}' for code in languages if code not in needed]
+
+    def car_queryset(self, queryset, prefix='', first_image=False):
+        """
+        Join and prefetch what this plan renders on a Car queryset, or on a queryset
+        reaching cars through `prefix` (e.g. 'car__' for cart items).
+        """
+        related = [prefix + name for name in ['car_make', 'car_model'] if self.expands(name)]
+        queryset = queryset.select_related(*related, *[prefix[:-2]] if prefix else [])
+        if self.includes('car_images'):
+            images = CarImage.objects.all() if self.expands('car_images') else CarImage.objects.only('id', 'car')
+            if first_image:
+                images = images.order_by('pk')[:1]
+            queryset = queryset.prefetch_related(Prefetch(
+                prefix + 'car_images', queryset=images, to_attr='first_images' if first_image else None,
+            ))
+        if self.includes('car_review'):
+            reviews = (
+                CarReview.objects.select_related('user') if self.expands('car_review')
+                else CarReview.objects.only('id', 'car')
+            )
+            queryset = queryset.prefetch_related(Prefetch(prefix + 'car_review', queryset=reviews))
+        return queryset.defer(*[prefix + name for name in self.deferred_descriptions()])
+
+
+class CarFieldsSerializerMixin:
+    """Applies the request's CarFieldPlan (context['car_fields']) to a car serializer."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        plan = self.context.get('car_fields')
+        return fields if plan is None else plan.apply(fields)
+
+
+class CarFieldsViewMixin:
+    """Adds the CarFieldPlan of the request, checked against `car_fields_serializer_class`, to the context."""
+    car_fields_serializer_class = None
+
+    def get_car_fields(self):
+        if not hasattr(self, '_car_fields'):
+            self._car_fields = CarFieldPlan.from_request(self.request, self.car_fields_serializer_class)
+        return self._car_fields
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'car_fields': self.get_car_fields()}
@@ -1,7 +1,12 @@
-from django_filters import FilterSet
+from django_filters import FilterSet, MultipleChoiceFilter, NumberFilter
 from .models import Car
 
 class CarFilter(FilterSet):
+    rating__gt = NumberFilter(field_name='rating', lookup_expr='gt')
+    rating__lt = NumberFilter(field_name='rating', lookup_expr='lt')
+    fuel = MultipleChoiceFilter(choices=Car.FUEL_CHOICES, method='filter_fuel')
+    fuel__all = MultipleChoiceFilter(choices=Car.FUEL_CHOICES, method='filter_fuel')
+
     class Meta:
         model = Car
         fields = {
@@ -9,4 +14,10 @@ class CarFilter(FilterSet):
             'car_model': ['exact'],
             'year' : ['gt', 'lt'],
             'price': ['gt', 'lt'],
-        }
\ No newline at end of file
+            'review_count': ['gt', 'lt'],
+        }
+
+    def filter_fuel(self, queryset, name, value):
+        field = Car._meta.get_field('fuel')
+        masks = field.masks(all_of=value) if name == 'fuel__all' else field.masks(any_of=value)
+        return queryset.filter(fuel__in=masks)
@@ -0,0 +1,99 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryRecorder:
+    """
+    Buffer car views in process and write them to History with one bulk_create per flush.
+
+    A flush happens when the buffer reaches STORE_HISTORY_BATCH_SIZE, when the oldest
+    buffered view is STORE_HISTORY_FLUSH_INTERVAL seconds old, and at interpreter exit.
+    Repeat views of the same car by the same client within STORE_HISTORY_DEDUPE_SECONDS
+    are dropped before they reach the buffer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._seen = {}
+        self._timer = None
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'STORE_HISTORY_BATCH_SIZE', 100)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'STORE_HISTORY_FLUSH_INTERVAL', 5)
+
+    @property
+    def dedupe_window(self):
+        return getattr(settings, 'STORE_HISTORY_DEDUPE_SECONDS', 300)
+
+    def record(self, client_id, car_id):
+        now = time.monotonic()
+        key = (client_id, car_id)
+        with self._lock:
+            last = self._seen.get(key)
+            if last is not None and now - last < self.dedupe_window:
+                return False
+            self._seen[key] = now
+            self._pending.append((client_id, car_id, timezone.now()))
+            full = len(self._pending) >= self.batch_size
+            if not full and self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return True
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing buffered history failed')
+        finally:
+            connections.close_all()
+
+    def clear(self):
+        with self._lock:
+            self._pending, self._seen = [], {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def flush(self):
+        from .models import Client, Car, History
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            horizon = time.monotonic() - self.dedupe_window
+            self._seen = {key: seen for key, seen in self._seen.items() if seen >= horizon}
+        if not pending:
+            return 0
+
+        clients = set(Client.objects.filter(pk__in={row[0] for row in pending}).values_list('pk', flat=True))
+        cars = set(Car.objects.filter(pk__in={row[1] for row in pending}).values_list('pk', flat=True))
+        History.objects.bulk_create(
+            History(client_id=client_id, car_id=car_id, date=date)
+            for client_id, car_id, date in pending
+            if client_id in clients and car_id in cars
+        )
+        return len(pending)
+
+
+recorder = HistoryRecorder()
+atexit.register(recorder._flush_in_background)
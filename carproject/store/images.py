@@ -0,0 +1,150 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZES = {
+    'thumb': (320, 240),
+    'medium': (800, 600),
+}
+
+DEFAULT_IMAGE_SIZE = 'thumb'
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'STORE_IMAGE_WORKERS', 2),
+                thread_name_prefix='store-images',
+            )
+        return _executor
+
+
+def variant_name(name, variant, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{variant}.{extension}'
+
+
+def render(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, image_format, quality=82, optimize=image_format == 'JPEG')
+    return buffer.getvalue()
+
+
+def generate_variants(field_file):
+    """
+    Write thumb/medium JPEG and WebP copies next to the original and return their storage names.
+
+    Files that Pillow cannot open (e.g. a CarMake logo uploaded as SVG) produce no variants.
+    """
+    storage = field_file.storage
+    try:
+        with storage.open(field_file.name, 'rb') as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            image.load()
+    except (OSError, ValueError):
+        logger.warning('Cannot build variants for %s', field_file.name, exc_info=True)
+        return {}
+
+    variants = {}
+    for size_name, size in IMAGE_SIZES.items():
+        for key, image_format, extension in [
+            (size_name, 'JPEG', 'jpg'),
+            (f'{size_name}_webp', 'WEBP', 'webp'),
+        ]:
+            name = variant_name(field_file.name, size_name, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            variants[key] = storage.save(name, ContentFile(render(image, size, image_format)))
+    variants['source'] = field_file.name
+    return variants
+
+
+def needs_variants(field_file, variants):
+    return bool(field_file) and (variants or {}).get('source') != field_file.name
+
+
+def process_car_image(pk, force=False):
+    from .models import CarImage
+    from .signals import car_tags
+    from .cache import invalidate_tags
+    from .cards import rebuild_cards
+
+    image = CarImage.objects.filter(pk=pk).only('image', 'variants', 'car_id').first()
+    if image is None or not (force and image.image or needs_variants(image.image, image.variants)):
+        return
+    variants = generate_variants(image.image)
+    if CarImage.objects.filter(pk=pk, image=image.image.name).update(variants=variants):
+        invalidate_tags(*car_tags([image.car_id]))
+        rebuild_cards([image.car_id])
+
+
+def process_car_make(pk, force=False):
+    from .models import CarMake
+    from .cache import invalidate_tags
+
+    make = CarMake.objects.filter(pk=pk).only('car_image', 'car_image_variants').first()
+    if make is None or not (force and make.car_image or needs_variants(make.car_image, make.car_image_variants)):
+        return
+    variants = generate_variants(make.car_image)
+    if CarMake.objects.filter(pk=pk, car_image=make.car_image.name).update(car_image_variants=variants):
+        invalidate_tags(f'car_make:{pk}')
+
+
+def run_task(task, pk):
+    try:
+        task(pk)
+    except Exception:
+        logger.exception('Image variant task %s(%s) failed', task.__name__, pk)
+
+
+def run_in_worker(task, pk):
+    try:
+        run_task(task, pk)
+    finally:
+        connections.close_all()
+
+
+def schedule(task, pk):
+    """Queue `task` on the worker pool once the current transaction commits."""
+    if getattr(settings, 'STORE_IMAGE_VARIANTS_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(run_in_worker, task, pk))
+    else:
+        transaction.on_commit(lambda: run_task(task, pk))
+
+
+def variant_url(field_file, variants, size=DEFAULT_IMAGE_SIZE, image_format=None, request=None):
+    if not field_file:
+        return None
+    return stored_variant_url(field_file.storage, field_file.name, variants, size, image_format, request)
+
+
+def stored_variant_url(storage, name, variants, size=DEFAULT_IMAGE_SIZE, image_format=None, request=None):
+    """variant_url() for a file name read with .values(), without building a FieldFile."""
+    if not name:
+        return None
+    if size != 'original':
+        key = f'{size}_webp' if image_format == 'webp' else size
+        name = (variants or {}).get(key, name)
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
@@ -0,0 +1,194 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import DataError, IntegrityError, transaction
+
+from .models import Category, CarMake, CarModel, Car
+from .signals import cars_changed, catalog_changed
+
+
+CAR_FIELDS = [
+    'car_make_id', 'car_model_id', 'description', 'description_ru', 'description_en',
+    'price', 'year', 'body', 'fuel', 'rudder', 'gearbox', 'color',
+]
+
+CHOICE_FIELDS = ['body', 'rudder', 'gearbox', 'color']
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def read_rows(stream, input_format):
+    if input_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+class CarImporter:
+    """
+    Upsert dealer feed rows into Car in batches.
+
+    Makes, models and categories are resolved through in-memory name maps and any
+    missing ones are bulk-created per batch. Rows with an `external_id` that already
+    exists are updated in place; everything else is inserted. A batch the database
+    rejects is retried row by row, and the rows that still fail are reported as errors.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.categories = dict(Category.objects.values_list('category_name', 'pk'))
+        self.makes = dict(CarMake.objects.values_list('car_name', 'pk'))
+        self.models = dict(CarModel.objects.values_list('car_model', 'pk'))
+        self.created = self.updated = 0
+        self.errors = []
+
+    def run(self, rows, on_batch=None):
+        for number, chunk in enumerate(chunks(rows, self.batch_size)):
+            offset = number * self.batch_size
+            try:
+                self.import_atomically(offset, chunk)
+            except (IntegrityError, DataError):
+                for index, row in enumerate(chunk, start=offset):
+                    try:
+                        self.import_atomically(index, [row])
+                    except (IntegrityError, DataError) as exc:
+                        self.errors.append((index + 1, str(exc)))
+            if on_batch:
+                on_batch(self)
+
+    def import_atomically(self, offset, chunk):
+        """Import `chunk` in one transaction, forgetting what it resolved and reported if it rolls back."""
+        state = dict(self.categories), dict(self.makes), dict(self.models), len(self.errors)
+        try:
+            with transaction.atomic():
+                self.import_batch(offset, chunk)
+        except (IntegrityError, DataError):
+            self.categories, self.makes, self.models, errors = state
+            del self.errors[errors:]
+            raise
+
+    def import_batch(self, offset, chunk):
+        parsed = []
+        for index, row in enumerate(chunk, start=offset + 1):
+            try:
+                parsed.append(self.parse(row))
+            except (ImportRowError, KeyError, TypeError) as exc:
+                self.errors.append((index, str(exc)))
+        if not parsed:
+            return
+
+        self.resolve(parsed)
+        cars = {}
+        for values in parsed:
+            car = Car(external_id=values['external_id'], **{field: values[field] for field in CAR_FIELDS})
+            cars[values['external_id'] or object()] = car
+
+        external_ids = [key for key in cars if isinstance(key, str)]
+        existing = {
+            external_id: (pk, car_make_id, car_model_id)
+            for external_id, pk, car_make_id, car_model_id in Car.objects.filter(external_id__in=external_ids)
+            .values_list('external_id', 'pk', 'car_make_id', 'car_model_id')
+        }
+        to_update, to_create, previous = [], [], []
+        for key, car in cars.items():
+            if key in existing:
+                car.pk, *parents = existing[key]
+                previous.append(parents)
+                to_update.append(car)
+            else:
+                to_create.append(car)
+
+        Car.objects.bulk_update(to_update, CAR_FIELDS)
+        Car.objects.bulk_create(to_create)
+        self.updated += len(to_update)
+        self.created += len(to_create)
+        cars_changed([car.pk for car in to_update + to_create], previous)
+
+    def parse(self, row):
+        row = {key: clean(value) for key, value in row.items()}
+        make, model = row.get('make'), row.get('model')
+        if not make or not model:
+            raise ImportRowError('make and model are required')
+        try:
+            price = Decimal(str(row['price']))
+            year = int(row['year'])
+        except (InvalidOperation, ValueError):
+            raise ImportRowError(f'invalid price or year: {row.get("price")!r}, {row.get("year")!r}')
+        fuel = row.get('fuel') or 'любое'
+        if isinstance(fuel, str):
+            fuel = [item.strip() for item in fuel.replace('|', ',').split(',') if item.strip()]
+        unknown = set(fuel) - {value for value, label in Car.FUEL_CHOICES}
+        if unknown:
+            raise ImportRowError(f'unknown fuel: {", ".join(sorted(unknown))}')
+        choices = {}
+        for field in CHOICE_FIELDS:
+            model_field = Car._meta.get_field(field)
+            choices[field] = row.get(field) or model_field.default
+            if choices[field] not in dict(model_field.choices):
+                raise ImportRowError(f'unknown {field}: {choices[field]}')
+        description_ru = row.get('description_ru') or row.get('description') or ''
+        return {
+            'external_id': str(row['external_id']) if row.get('external_id') else None,
+            'make': make,
+            'model': model,
+            'category': row.get('category') or None,
+            'description': description_ru,
+            'description_ru': description_ru,
+            'description_en': row.get('description_en') or None,
+            'price': price,
+            'year': year,
+            'fuel': fuel,
+            **choices,
+        }
+
+    def resolve(self, parsed):
+        new_categories = {values['category'] for values in parsed if values['category']} - self.categories.keys()
+        if new_categories:
+            Category.objects.bulk_create(Category(category_name=name) for name in new_categories)
+            self.categories.update(Category.objects.filter(category_name__in=new_categories)
+                                   .values_list('category_name', 'pk'))
+
+        new_makes = {}
+        for values in parsed:
+            if values['make'] not in self.makes:
+                new_makes.setdefault(values['make'], self.categories.get(values['category']))
+        if new_makes:
+            CarMake.objects.bulk_create(
+                CarMake(car_name=name, category_id=category) for name, category in new_makes.items()
+            )
+            self.makes.update(CarMake.objects.filter(car_name__in=new_makes).values_list('car_name', 'pk'))
+
+        new_models = {}
+        for values in parsed:
+            if values['model'] not in self.models:
+                new_models.setdefault(values['model'], (self.makes[values['make']], self.categories.get(values['category'])))
+        if new_models:
+            CarModel.objects.bulk_create(
+                CarModel(car_model=name, car_make_id=make, category_id=category)
+                for name, (make, category) in new_models.items()
+            )
+            self.models.update(CarModel.objects.filter(car_model__in=new_models).values_list('car_model', 'pk'))
+
+        if new_categories or new_makes or new_models:
+            catalog_changed([*new_makes.values(), *(category for make, category in new_models.values())])
+
+        for values in parsed:
+            values['car_make_id'] = self.makes[values['make']]
+            values['car_model_id'] = self.models[values['model']]
@@ -0,0 +1,92 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from store.benchmark import (
+    BENCHMARK_PASSWORD, BENCHMARK_USERNAME, SCENARIOS, Fixture, HTTPTransport, InProcessTransport,
+    compare, run_benchmark, seed,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the store API: throughput, p50/p95/p99 latency and SQL queries per request. '
+        'Runs in process against a freshly seeded test database unless --url points at a running server.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000.')
+        parser.add_argument('--username', default=BENCHMARK_USERNAME)
+        parser.add_argument('--password', default=BENCHMARK_PASSWORD)
+        parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), default=[],
+                            help='Scenario to run. May be repeated; defaults to all.')
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=1, help='Parallel clients; --url mode only.')
+        parser.add_argument('--cars', type=int, default=500, help='Cars to seed.')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache in process.')
+        parser.add_argument('--seed', action='store_true',
+                            help='Seed the configured database for a --url run, then exit.')
+        parser.add_argument('--output', help='Write the results as JSON to this path.')
+        parser.add_argument('--baseline', help='Compare against a previous JSON result and fail on regressions.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed latency growth over the baseline, as a fraction.')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed(options['cars'])
+            self.stdout.write(self.style.SUCCESS(f'Seeded {options["cars"]} cars.'))
+            return
+        if options['concurrency'] > 1 and not options['url']:
+            raise CommandError('--concurrency needs --url; the in-process client is single threaded.')
+
+        if options['url']:
+            results = self.run(HTTPTransport(options['url']), options)
+        else:
+            results = self.run_in_process(options)
+
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(results, stream, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as stream:
+                baseline = json.load(stream)
+            regressions = compare(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
+
+    def run_in_process(self, options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            caches['default'].clear()
+            seed(options['cars'])
+            settings = {'STORE_RESPONSE_CACHE_TIMEOUT': 0} if options['no_cache'] else {}
+            with override_settings(**settings):
+                return self.run(InProcessTransport(), options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, transport, options):
+        self.stdout.write(f'{"scenario":<20} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8} {"errors":>7}')
+
+        def report(name, result):
+            queries = '-' if result['queries'] is None else result['queries']
+            self.stdout.write(
+                f'{name:<20} {result["throughput"]:>9} {result["p50_ms"]:>9} {result["p95_ms"]:>9} '
+                f'{result["p99_ms"]:>9} {queries:>8} {result["errors"]:>7}'
+            )
+
+        fixture = Fixture(options['username'], options['password'])
+        if not fixture.car_ids:
+            raise CommandError('No cars to benchmark; run with --seed against the server database first.')
+        return run_benchmark(
+            transport, fixture, options['scenario'], options['requests'], options['warmup'],
+            options['concurrency'], on_result=report,
+        )
@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+
+from store.benchmark import percentile
+from store.models import Car
+from store.views import car_list_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent read/write throughput of the configured database profile (DB_PROFILE). '
+        'Readers run car list pages, writers commit no-op price updates, so data is left unchanged.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds to run.')
+
+    def handle(self, *args, **options):
+        car_ids = list(Car.objects.values_list('pk', flat=True)[:1000])
+        if not car_ids:
+            raise CommandError('No cars to benchmark; seed the database first (benchmark_api --seed).')
+        connection.close()
+
+        deadline = time.monotonic() + options['duration']
+        results = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+
+        def read(rng):
+            offset = rng.randrange(0, max(1, len(car_ids) - 20))
+            list(car_list_queryset().order_by('-price')[offset:offset + 20])
+
+        def write(rng):
+            with transaction.atomic():
+                Car.objects.filter(pk=rng.choice(car_ids)).update(price=F('price'))
+
+        def worker(kind, operation, seed):
+            rng = random.Random(seed)
+            timings, failed = [], 0
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation(rng)
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    timings.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                results[kind].extend(timings)
+                errors[kind] += failed
+
+        threads = [
+            threading.Thread(target=worker, args=('read', read, index)) for index in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=('write', write, 1000 + index)) for index in range(options['writers'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(f'profile {settings.DB_PROFILE} ({connection.vendor}), '
+                          f'{options["readers"]} readers, {options["writers"]} writers, {elapsed:.1f}s')
+        self.stdout.write(f'{"operation":<10} {"ops/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}')
+        for kind, timings in results.items():
+            latencies = [timing * 1000 for timing in timings]
+            p50, p95, p99 = (percentile(latencies, fraction) for fraction in (0.5, 0.95, 0.99))
+            self.stdout.write(
+                f'{kind:<10} {len(timings) / elapsed:>9.1f} {p50 or 0:>9.2f} {p95 or 0:>9.2f} {p99 or 0:>9.2f} '
+                f'{errors[kind]:>7}'
+            )
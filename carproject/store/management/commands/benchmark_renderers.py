@@ -0,0 +1,72 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store.benchmark import percentile
+from store.renderers import MessagePackParser, MessagePackRenderer, ORJSONParser, ORJSONRenderer, msgpack
+from store.serializers import CarListSerializer
+from store.views import CarListAPIView, CarMakeDetailAPIView, CategoryDetailAPIView
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer/JSONParser with the store's orjson (and, when installed, "
+        'MessagePack) renderers and parsers on the largest make, the largest category and a car list page.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        payloads = self.payloads(options['page_size'])
+        codecs = [
+            ('drf-json', JSONRenderer(), JSONParser()),
+            ('orjson', ORJSONRenderer(), ORJSONParser()),
+        ]
+        if msgpack is not None:
+            codecs.append(('msgpack', MessagePackRenderer(), MessagePackParser()))
+
+        self.stdout.write(f'{"payload":<14} {"codec":<9} {"bytes":>9} {"render µs":>10} {"parse µs":>10} {"speedup":>8}')
+        for name, data in payloads.items():
+            baseline = None
+            for codec, renderer, parser in codecs:
+                body = renderer.render(data)
+                render = self.median(lambda: renderer.render(data), options['repeat'])
+                parse = self.median(lambda: parser.parse(BytesIO(body), parser_context={}), options['repeat'])
+                baseline = baseline or render
+                self.stdout.write(
+                    f'{name:<14} {codec:<9} {len(body):>9} {render:>10.1f} {parse:>10.1f} {baseline / render:>7.1f}x'
+                )
+            if ORJSONRenderer().render(data) != JSONRenderer().render(data):
+                self.stderr.write(f'{name}: orjson output differs from JSONRenderer')
+
+    def payloads(self, page_size):
+        request = Request(APIRequestFactory().get('/'))
+        make = CarMakeDetailAPIView.queryset.annotate(cars=Count('makes')).order_by('-cars').first()
+        category = CategoryDetailAPIView.queryset.annotate(makes=Count('category_make')).order_by('-makes').first()
+        if make is None or category is None:
+            raise CommandError('No catalog to benchmark; seed the database first (benchmark_api --seed).')
+        cars = CarListAPIView.queryset.order_by('-date_registered')[:page_size]
+        context = {'request': request}
+        return {
+            'car_make': CarMakeDetailAPIView.serializer_class(make, context=context).data,
+            'category': CategoryDetailAPIView.serializer_class(category, context=context).data,
+            'car_page': {'count': page_size, 'next': None, 'previous': None,
+                         'results': CarListSerializer(cars, many=True, context=context).data},
+        }
+
+    @staticmethod
+    def median(operation, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            operation()
+            timings.append((time.perf_counter() - started) * 1e6)
+        return percentile(timings, 0.5)
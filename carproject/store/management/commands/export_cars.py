@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from store.export import WRITERS, export_queryset, export_rows
+from store.filters import CarFilter
+from store.models import Car
+
+
+class Command(BaseCommand):
+    help = 'Stream the car catalog as NDJSON or CSV, optionally narrowed with CarFilter params.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(WRITERS), default='ndjson')
+        parser.add_argument('--output', default='-', help='File path, or - for stdout.')
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help='CarFilter parameter, e.g. --filter price__lt=20000. May be repeated.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for item in options['filter']:
+            name, _, value = item.partition('=')
+            params.appendlist(name, value)
+        filterset = CarFilter(params, queryset=Car.objects.with_rating())
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_json())
+
+        rows = export_rows(export_queryset(filterset.qs), chunk_size=options['chunk_size'])
+        lines = WRITERS[options['format']](rows)
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+            stream.writelines(lines)
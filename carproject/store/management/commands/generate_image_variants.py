@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.images import process_car_image, process_car_make
+from store.models import CarImage, CarMake
+
+
+def run(task, pk, force):
+    try:
+        task(pk, force)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail/medium/WebP variants for existing CarImage and CarMake images in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Use 1 to process images serially.')
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist.')
+
+    def pending(self, queryset, file_field, variants_field, force):
+        rows = queryset.exclude(**{file_field: ''}).values_list('pk', file_field, variants_field)
+        for pk, name, variants in rows.iterator(chunk_size=2000):
+            if name and (force or (variants or {}).get('source') != name):
+                yield pk
+
+    def handle(self, *args, **options):
+        force = options['force']
+        jobs = [
+            (process_car_image, pk)
+            for pk in self.pending(CarImage.objects.all(), 'image', 'variants', force)
+        ] + [
+            (process_car_make, pk)
+            for pk in self.pending(CarMake.objects.all(), 'car_image', 'car_image_variants', force)
+        ]
+        started = time.monotonic()
+        failed = 0
+        if options['workers'] > 1:
+            executor = ThreadPoolExecutor(max_workers=options['workers'])
+            results = [executor.submit(run, task, pk, force).result for task, pk in jobs]
+        else:
+            executor = None
+            results = [partial(task, pk, force) for task, pk in jobs]
+        for (task, pk), result in zip(jobs, results):
+            try:
+                result()
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'{task.__name__}({pk}) failed: {exc}')
+        if executor is not None:
+            executor.shutdown()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(jobs) - failed} images in {elapsed:.1f}s ({failed} failed)'
+        ))
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importer import CarImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a dealer inventory feed (CSV with a header row, or JSON lines) into the catalog. '
+        'Rows are upserted by external_id in batches; missing makes, models and categories are created.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file, or - for stdin.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if path == '-':
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as exc:
+                raise CommandError(exc)
+
+        importer = CarImporter(batch_size=options['batch_size'])
+        started = time.monotonic()
+
+        def report(importer):
+            if options['verbosity'] > 1:
+                rows = importer.created + importer.updated
+                self.stdout.write(f'{rows} rows, {rows / (time.monotonic() - started):.0f} rows/sec')
+
+        try:
+            importer.run(read_rows(stream, input_format), on_batch=report)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line, error in importer.errors:
+            self.stderr.write(f'row {line}: {error}')
+        elapsed = time.monotonic() - started
+        rows = importer.created + importer.updated
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {rows} rows ({importer.created} created, {importer.updated} updated, '
+            f'{len(importer.errors)} skipped) in {elapsed:.1f}s, {rows / elapsed if elapsed else 0:.0f} rows/sec'
+        ))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.cards import rebuild_cards
+
+
+class Command(BaseCommand):
+    help = 'Render the pre-built car list cards of every car in every language.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--language', action='append', choices=[code for code, name in settings.LANGUAGES],
+            help='Only rebuild cards in this language; repeat for several.',
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_cards(languages=options['language'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt cards of {rebuilt} cars'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored review_count, rating_sum and star histogram of every car.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated ratings of {updated} cars'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the car full-text search index from the catalog tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None)
+
+    def handle(self, *args, **options):
+        backend = get_backend(options['database'])
+        backend.rebuild(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search index with {type(backend).__name__}'))
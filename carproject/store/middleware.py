@@ -0,0 +1,115 @@
+import heapq
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger('store.sql')
+
+
+class QueryStats:
+    """Collects every statement run through `connection.execute_wrapper` during one request."""
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            self.statements[(context['connection'].alias, sql, params_key(params))] += 1
+            entry = (duration, self.count, context['connection'].alias, sql)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def duplicated(self):
+        return [
+            {'alias': alias, 'sql': sql, 'count': count}
+            for (alias, sql, _), count in self.statements.most_common() if count > 1
+        ]
+
+    def slowest_statements(self):
+        return [
+            {'alias': alias, 'sql': sql, 'ms': round(duration * 1000, 3)}
+            for duration, _, alias, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+def params_key(params):
+    if params is None:
+        return None
+    try:
+        key = tuple(params) if isinstance(params, (list, tuple)) else params
+        hash(key)
+        return key
+    except TypeError:
+        return repr(params)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count, time and de-duplicate the SQL behind each request on every configured database.
+
+    Enabled with STORE_SQL_INSTRUMENTATION. Every response gets a `Server-Timing` header with
+    the database and total time; requests slower than STORE_SLOW_REQUEST_MS are logged to
+    `store.sql` with their duplicated and slowest statements in `extra['request_stats']`.
+    Statements run while a streaming response is consumed happen after the middleware
+    returns and are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'STORE_SQL_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'STORE_SLOW_REQUEST_MS', 500)
+        self.keep = getattr(settings, 'STORE_SLOW_QUERY_COUNT', 5)
+
+    def __call__(self, request):
+        stats = QueryStats(self.keep)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.duration * 1000
+
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.2f};desc="{stats.count} queries, {stats.duplicates} duplicates", '
+            f'total;dur={total_ms:.2f}'
+        )
+        if total_ms >= self.slow_request_ms:
+            logger.warning(
+                'Slow request %s %s: %.1f ms, %d queries in %.1f ms, %d duplicates',
+                request.method, request.path, total_ms, stats.count, db_ms, stats.duplicates,
+                extra={'request_stats': {
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'total_ms': round(total_ms, 3),
+                    'db_ms': round(db_ms, 3),
+                    'queries': stats.count,
+                    'duplicates': stats.duplicated(),
+                    'slowest': stats.slowest_statements(),
+                }},
+            )
+        return response
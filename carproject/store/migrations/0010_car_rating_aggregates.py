@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:20
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_ratings(apps, schema_editor):
+    Car = apps.get_model('store', 'Car')
+    CarReview = apps.get_model('store', 'CarReview')
+    rows = CarReview.objects.values('car_id').order_by().annotate(
+        review_count=Count('id'),
+        rating_sum=Sum('stars'),
+        **{f'stars_{stars}': Count('id', filter=Q(stars=stars)) for stars in range(1, 6)},
+    )
+    for row in rows:
+        Car.objects.filter(pk=row.pop('car_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_alter_cartitem_cart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS store_car_search USING fts5('
+        "car_make, car_model, description_ru, description_en, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        'INSERT INTO store_car_search (rowid, car_make, car_model, description_ru, description_en) '
+        'SELECT car.id, make.car_name, model.car_model, car.description_ru, car.description_en '
+        'FROM store_car car '
+        'JOIN store_carmake make ON make.id = car.car_make_id '
+        'JOIN store_carmodel model ON model.id = car.car_model_id'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS store_car_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_car_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_car_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='carmake',
+            name='car_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
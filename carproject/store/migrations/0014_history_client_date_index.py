@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_car_external_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='history',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['client', 'date'], name='store_history_client_date'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations, models
+
+import store.fields
+import store.models
+
+
+FUEL_FLAGS = ['любое', 'бензин', 'дизель', 'гибрид', 'электро', 'газ']
+
+
+def strings_to_masks(apps, schema_editor):
+    Car = apps.get_model('store', 'Car')
+    groups = {}
+    for pk, fuel in Car.objects.values_list('pk', 'fuel').iterator(chunk_size=2000):
+        mask = 0
+        for value in fuel or []:
+            if value in FUEL_FLAGS:
+                mask |= 1 << FUEL_FLAGS.index(value)
+        groups.setdefault(mask or 1, []).append(pk)
+    for mask, pks in groups.items():
+        for start in range(0, len(pks), 500):
+            Car.objects.filter(pk__in=pks[start:start + 500]).update(fuel_mask=mask)
+
+
+def masks_to_strings(apps, schema_editor):
+    Car = apps.get_model('store', 'Car')
+    for mask in Car.objects.values_list('fuel_mask', flat=True).distinct():
+        values = [flag for bit, flag in enumerate(FUEL_FLAGS) if mask & (1 << bit)]
+        Car.objects.filter(fuel_mask=mask).update(fuel=','.join(values))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_history_client_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='fuel_mask',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(strings_to_masks, masks_to_strings),
+        migrations.RemoveField(
+            model_name='car',
+            name='fuel',
+        ),
+        migrations.RenameField(
+            model_name='car',
+            old_name='fuel_mask',
+            new_name='fuel',
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='fuel',
+            field=store.fields.BitmaskField(db_index=True, default=store.models.default_fuel, flags=[('любое', 'любое'), ('бензин', 'бензин'), ('дизель', 'дизель'), ('гибрид', 'гибрид'), ('электро', 'электро'), ('газ', 'газ')], max_choices=2, verbose_name='Топливо'),
+        ),
+    ]
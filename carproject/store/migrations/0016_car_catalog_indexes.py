@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_car_fuel_bitmask'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['car_make', 'price'], name='store_car_make_price'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['car_model', 'price'], name='store_car_model_price'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['year', 'price'], name='store_car_year_price'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['price', 'date_registered', 'id'], name='store_car_price_date'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['date_registered', 'id'], name='store_car_date'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['review_count'], name='store_car_review_count'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_car_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=8)),
+                ('body', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cards', to='store.car')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('car', 'language'), name='store_carcard_car_language')],
+            },
+        ),
+    ]
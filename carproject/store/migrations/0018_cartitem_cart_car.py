@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_items(apps, schema_editor):
+    CartItem = apps.get_model('store', 'CartItem')
+    duplicates = CartItem.objects.values('cart', 'car').annotate(keep=Min('pk'), items=Count('pk')).filter(items__gt=1)
+    for row in duplicates:
+        CartItem.objects.filter(cart=row['cart'], car=row['car']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_carcard'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'car'), name='store_cartitem_cart_car'),
+        ),
+    ]
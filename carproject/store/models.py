@@ -1,8 +1,13 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from multiselectfield import MultiSelectField
+from .fields import BitmaskField
 
 
 ROLE_CHOICES = (
@@ -51,6 +56,7 @@ class Category(models.Model):
 class CarMake(models.Model):
     car_name = models.CharField(max_length=32, unique=True)
     car_image = models.FileField(upload_to='car_images/', null=True, blank=True)
+    car_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='category_make')
 
     def __str__(self):
@@ -67,7 +73,23 @@ class CarModel(models.Model):
 
 
 
+STARS = range(1, 6)
+
+
+def default_fuel():
+    return ['любое']
+
+
+class CarQuerySet(models.QuerySet):
+    def with_rating(self):
+        return self.annotate(rating=Case(
+            When(review_count=0, then=None),
+            default=ExpressionWrapper(F('rating_sum') * 1.0 / F('review_count'), output_field=models.FloatField()),
+        ))
+
+
 class Car(models.Model):
+    external_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
     car_make = models.ForeignKey(CarMake, on_delete=models.CASCADE, related_name='makes')
     car_model = models.ForeignKey(CarModel, on_delete=models.CASCADE, related_name='model')
     description = models.TextField()
@@ -92,7 +114,7 @@ class Car(models.Model):
         ('электро', 'электро'),
         ('газ', 'газ'),
     )
-    fuel = MultiSelectField(max_length=32, choices=FUEL_CHOICES, max_choices=2, default='любое', verbose_name='Топливо')
+    fuel = BitmaskField(flags=FUEL_CHOICES, max_choices=2, default=default_fuel, db_index=True, verbose_name='Топливо')
     RUDDER_CHOICES = (
         ('слева', 'слева'),
         ('справа', 'справа'),
@@ -114,49 +136,101 @@ class Car(models.Model):
     )
     color = models.CharField(max_length=32, choices=COLOR_CHOICES, default='любое', verbose_name='Цвет')
     date_registered = models.DateTimeField(auto_now_add=True)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CarQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.car_make}, {self.car_model}'
 
     def get_count_people(self):
-        people = self.car_review.all()
-        if people.exists():
-            return people.count()
-        return 0
+        return self.review_count
 
 
     def get_avg_rating(self):
-        total = self.car_review.all()
-        if total.exists():
-            return round(sum([i.stars for i in total]) / total.count(), 1)
+        if self.review_count:
+            return round(self.rating_sum / self.review_count, 1)
+
+    def get_rating_histogram(self):
+        return {stars: getattr(self, f'stars_{stars}') for stars in STARS}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['car_make', 'price'], name='store_car_make_price'),
+            models.Index(fields=['car_model', 'price'], name='store_car_model_price'),
+            models.Index(fields=['year', 'price'], name='store_car_year_price'),
+            models.Index(fields=['price', 'date_registered', 'id'], name='store_car_price_date'),
+            models.Index(fields=['date_registered', 'id'], name='store_car_date'),
+            models.Index(fields=['review_count'], name='store_car_review_count'),
+        ]
 
 
 class CarImage(models.Model):
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='car_images')
     image = models.ImageField(upload_to='images/')
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.car}'
 
+
+class CarCard(models.Model):
+    """The pre-rendered CarListSerializer JSON of a car in one language, see store.cards."""
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='cards')
+    language = models.CharField(max_length=8)
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['car', 'language'], name='store_carcard_car_language')]
+
 class CarReview(models.Model):
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='car_review')
     user = models.ForeignKey(Client, on_delete=models.CASCADE)
     text = models.TextField()
-    stars = models.IntegerField(choices=[(i, str(i)) for i in range(1, 6)])
+    stars = models.IntegerField(choices=[(i, str(i)) for i in STARS])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'car_id' in field_names and 'stars' in field_names:
+            instance._loaded_rating = (instance.car_id, instance.stars)
+        return instance
+
+
+class CartQuerySet(models.QuerySet):
+    def with_total_price(self):
+        return self.annotate(total_price=Coalesce(
+            Sum('cart_item__car__price'), Value(Decimal('0')), output_field=models.DecimalField(),
+        ))
 
 
 class Cart(models.Model):
     client = models.OneToOneField(Client, on_delete=models.CASCADE)
 
+    objects = CartQuerySet.as_manager()
+
     def get_total_price(self):
-        total_price = sum(item.get_total_price() for item in self.item.all())
-        return total_price
+        if hasattr(self, 'total_price'):
+            return self.total_price
+        return self.cart_item.aggregate(total=Coalesce(
+            Sum('car__price'), Value(Decimal('0')), output_field=models.DecimalField(),
+        ))['total']
 
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='cart_item')
     car = models.ForeignKey(Car, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['cart', 'car'], name='store_cartitem_cart_car')]
+
 
 class Favorite(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
@@ -169,4 +243,7 @@ class FavoriteItem(models.Model):
 class History(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     car = models.ForeignKey(Car, on_delete=models.CASCADE)
-    date = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['client', 'date'], name='store_history_client_date')]
\ No newline at end of file
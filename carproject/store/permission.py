@@ -1,7 +1,16 @@
 from rest_framework import permissions
+from .models import Client
 
 class CheckUserReview(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.user.role == 'client':
             return True
-        return False
\ No newline at end of file
+        return False
+
+
+class IsClient(permissions.BasePermission):
+    def has_permission(self, request, view):
+        user = request.user
+        if isinstance(user, Client):
+            return True
+        return bool(user and user.is_authenticated) and Client.objects.filter(pk=user.pk).exists()
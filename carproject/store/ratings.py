@@ -0,0 +1,55 @@
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+
+from .models import STARS, Car, CarReview
+
+
+RATING_FIELDS = ['review_count', 'rating_sum'] + [f'stars_{stars}' for stars in STARS]
+
+
+def _shift(field, delta):
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def apply_review(car_id, stars, delta):
+    Car.objects.filter(pk=car_id).update(**{
+        'review_count': _shift('review_count', delta),
+        'rating_sum': _shift('rating_sum', delta * stars),
+        f'stars_{stars}': _shift(f'stars_{stars}', delta),
+    })
+
+
+def review_aggregates(car_ids=None):
+    reviews = CarReview.objects.all()
+    if car_ids is not None:
+        reviews = reviews.filter(car_id__in=car_ids)
+    rows = reviews.values('car_id').order_by().annotate(
+        review_count=Count('id'),
+        rating_sum=Sum('stars'),
+        **{f'stars_{stars}': Count('id', filter=Q(stars=stars)) for stars in STARS},
+    )
+    return {row.pop('car_id'): row for row in rows}
+
+
+def rebuild_ratings(batch_size=1000):
+    """Recompute the stored rating columns of every car, writing only changed rows."""
+    empty = dict.fromkeys(RATING_FIELDS, 0)
+    updated = 0
+    last_id = 0
+    while True:
+        cars = list(Car.objects.filter(pk__gt=last_id).order_by('pk').only('pk', *RATING_FIELDS)[:batch_size])
+        if not cars:
+            return updated
+        last_id = cars[-1].pk
+        aggregates = review_aggregates([car.pk for car in cars])
+        changed = []
+        for car in cars:
+            values = aggregates.get(car.pk, empty)
+            if any(getattr(car, field) != values[field] for field in RATING_FIELDS):
+                for field in RATING_FIELDS:
+                    setattr(car, field, values[field])
+                changed.append(car)
+        Car.objects.bulk_update(changed, RATING_FIELDS)
+        updated += len(changed)
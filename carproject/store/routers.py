@@ -0,0 +1,112 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+
+
+STICKY_COOKIE = 'store_primary'
+
+_replica_reads = ContextVar('store_replica_reads', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'STORE_REPLICA_STICKY_SECONDS', 5)
+
+
+def replica_reads_active():
+    return _replica_reads.get() and bool(get_replicas())
+
+
+def use_primary():
+    """Send the remaining reads of the current request to the primary."""
+    _replica_reads.set(False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def writer_key(user_id):
+    return f'store:recent_writer:{user_id}'
+
+
+def mark_writer(user_id):
+    from .cache import get_cache
+
+    get_cache().set(writer_key(user_id), 1, get_sticky_seconds())
+
+
+def is_recent_writer(user_id):
+    from .cache import get_cache
+
+    return get_cache().get(writer_key(user_id)) is not None
+
+
+def check_writer_cache():
+    """Writer markers must reach every worker, so replicas need a cache shared between processes."""
+    from .cache import get_cache
+
+    if get_replicas() and isinstance(get_cache(), (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            'DATABASE_REPLICAS needs a shared cache backend (e.g. Redis, Memcached or the file or database '
+            'cache) for STORE_RESPONSE_CACHE_ALIAS, otherwise writers may not read their own writes.'
+        )
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads to a random DATABASE_REPLICAS alias while replica reads are enabled.
+
+    Replica reads are off by default, so management commands, signal handlers and
+    worker threads always read from the primary; ReplicaRoutingMiddleware turns them on
+    for safe-method requests. Writes always go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads_active():
+            return random.choice(get_replicas())
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serve GET/HEAD/OPTIONS requests from the replicas, except right after a client wrote.
+
+    A write sets a short-lived cookie and, for authenticated users, a shared-cache marker
+    that CachedJWTAuthentication checks, so the writer reads its own writes from the
+    primary for STORE_REPLICA_STICKY_SECONDS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        with replica_reads(safe and STICKY_COOKIE not in request.COOKIES):
+            response = self.get_response(request)
+        if not safe and get_replicas():
+            response.set_cookie(STICKY_COOKIE, '1', max_age=get_sticky_seconds(), httponly=True, samesite='Lax')
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                mark_writer(user.pk)
+        return response
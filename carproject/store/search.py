@@ -0,0 +1,112 @@
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+
+from .models import Car
+
+
+SEARCH_FIELDS = ['car_make__car_name', 'car_model__car_model', 'description_ru', 'description_en']
+
+
+class DatabaseSearchBackend:
+    """Unranked fallback that ANDs terms across icontains lookups on the indexed fields."""
+
+    def search(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(
+                Q(*[Q(**{f'{field}__icontains': term}) for field in SEARCH_FIELDS], _connector=Q.OR)
+            )
+        return queryset
+
+    def index(self, car_ids, using=None):
+        pass
+
+    def remove(self, car_ids, using=None):
+        pass
+
+    def rebuild(self, using=None):
+        pass
+
+
+class SQLiteFTSBackend(DatabaseSearchBackend):
+    """
+    Ranked full-text search over an FTS5 table keyed by car id.
+
+    Rows are joined back to store_car on rowid, so filtering, counting and paging
+    happen in one statement and matches come back ordered by bm25 rank.
+    """
+    table = 'store_car_search'
+    create_sql = (
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5('
+        "car_make, car_model, description_ru, description_en, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    populate_sql = (
+        f'INSERT INTO {table} (rowid, car_make, car_model, description_ru, description_en) '
+        'SELECT car.id, make.car_name, model.car_model, car.description_ru, car.description_en '
+        'FROM store_car car '
+        'JOIN store_carmake make ON make.id = car.car_make_id '
+        'JOIN store_carmodel model ON model.id = car.car_model_id'
+    )
+
+    @staticmethod
+    def match_expression(terms):
+        tokens = [token for term in terms for token in re.findall(r'\w+', term)]
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset, terms):
+        expression = self.match_expression(terms)
+        if not expression:
+            return queryset
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = store_car.id', f'{self.table} MATCH %s'],
+            params=[expression],
+            select={'search_rank': f'{self.table}.rank'},
+            order_by=['search_rank'],
+        )
+
+    def _execute(self, sql, params=(), using=None):
+        using = using or router.db_for_write(Car)
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def index(self, car_ids, using=None):
+        car_ids = list(car_ids)
+        if not car_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(car_ids))
+        self.remove(car_ids, using)
+        self._execute(f'{self.populate_sql} WHERE car.id IN ({placeholders})', car_ids, using)
+
+    def remove(self, car_ids, using=None):
+        car_ids = list(car_ids)
+        if not car_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(car_ids))
+        self._execute(f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})', car_ids, using)
+
+    def rebuild(self, using=None):
+        self._execute(self.create_sql, using=using)
+        self._execute(f'DELETE FROM {self.table}', using=using)
+        self._execute(self.populate_sql, using=using)
+
+
+def get_backend(using=None):
+    backend = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+    if backend:
+        return import_string(backend)()
+    vendor = connections[using or router.db_for_read(Car)].vendor
+    return SQLiteFTSBackend() if vendor == 'sqlite' else DatabaseSearchBackend()
+
+
+class CarSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_backend(queryset.db).search(queryset, terms)
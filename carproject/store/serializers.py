@@ -3,8 +3,13 @@ from .models import (
     UserProfile, Client, Owner, CarMake, CarModel, Category, Car,
     CarImage, Cart, CartItem, Favorite, FavoriteItem, History, CarReview
 )
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.urls import reverse
+from .fields import BitmaskSerializerField
+from .fieldsets import CarFieldsSerializerMixin
+from .images import DEFAULT_IMAGE_SIZE, IMAGE_SIZES, variant_url
 
 
 class OwnerRegisterSerializer(serializers.ModelSerializer):
@@ -109,21 +114,81 @@ class CategoryListSerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'category_name']
 
+def nested_page(related_manager):
+    return related_manager.order_by('pk')[:getattr(settings, 'STORE_NESTED_PAGE_SIZE', 10)]
+
+
+class NestedPageField(serializers.Field):
+    """
+    The first STORE_NESTED_PAGE_SIZE objects of a reverse relation, ordered by id, with
+    their total count and the URL of the paginated list they start.
+    """
+
+    def __init__(self, serializer_class, view_name, **kwargs):
+        self.serializer_class = serializer_class
+        self.view_name = view_name
+        super().__init__(read_only=True, **kwargs)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, instance):
+        from .values import VALUES_SERIALIZERS
+
+        related = getattr(instance, self.source)
+        serializer = VALUES_SERIALIZERS[self.serializer_class](context=self.context)
+        url = reverse(self.view_name, args=[instance.pk])
+        request = self.context.get('request')
+        return {
+            'count': related.count(),
+            'url': request.build_absolute_uri(url) if request is not None else url,
+            'results': serializer.to_representation(serializer.rows(nested_page(related))),
+        }
+
+
 class CategoryDetailSerializer(serializers.ModelSerializer):
-    category_make = CarMakeListSerializer(many=True, read_only=True)
-    category_model = CarModelListSerializer(many=True, read_only=True)
+    category_make = NestedPageField(CarMakeListSerializer, 'category_makes')
+    category_model = NestedPageField(CarModelListSerializer, 'category_models')
 
     class Meta:
         model = Category
         fields = ['category_name', 'category_make', 'category_model']
 
 
+class ImageVariantMixin:
+    """Resolve an image to the variant picked by ?image_size= and ?image_format=webp."""
+
+    def get_variant_options(self):
+        request = self.context.get('request')
+        size, image_format = DEFAULT_IMAGE_SIZE, None
+        if request is not None:
+            size = request.query_params.get('image_size', size)
+            if size not in IMAGE_SIZES:
+                size = 'original'
+            image_format = request.query_params.get('image_format')
+        return size, image_format
+
+    def get_variant_url(self, field_file, variants):
+        return variant_url(field_file, variants, *self.get_variant_options(), self.context.get('request'))
+
+
 class CarImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = CarImage
         fields = ['id', 'image']
 
 
+class CarImageListSerializer(ImageVariantMixin, serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CarImage
+        fields = ['id', 'image']
+
+    def get_image(self, obj):
+        return self.get_variant_url(obj.image, obj.variants)
+
+
 class CarReviewSerializer(serializers.ModelSerializer):
     user = UserProfileSerializer()
     class Meta:
@@ -132,12 +197,14 @@ class CarReviewSerializer(serializers.ModelSerializer):
 
 
 class CarSerializer(serializers.ModelSerializer):
+    fuel = BitmaskSerializerField(choices=Car.FUEL_CHOICES, required=False)
+
     class Meta:
         model = Car
         fields = '__all__'
 
-class CarListSerializer(serializers.ModelSerializer):
-    car_images = CarImageSerializer(many=True, read_only=True)
+class CarListSerializer(CarFieldsSerializerMixin, serializers.ModelSerializer):
+    car_images = CarImageListSerializer(many=True, read_only=True)
     car_make = CarMakeListSerializer()
     car_model = CarModelListSerializer()
 
@@ -145,18 +212,21 @@ class CarListSerializer(serializers.ModelSerializer):
         model = Car
         fields = ['id', 'car_make', 'car_model', 'car_images', 'year', 'price']
 
-class CarDetailSerializer(serializers.ModelSerializer):
+class CarDetailSerializer(CarFieldsSerializerMixin, serializers.ModelSerializer):
     car_images = CarImageSerializer(many=True, read_only=True)
     car_make = CarMakeListSerializer()
     car_model = CarModelListSerializer()
     car_review = CarReviewSerializer(many=True, read_only=True)
     count_people = serializers.SerializerMethodField()
     avg_rating = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
+    fuel = BitmaskSerializerField(choices=Car.FUEL_CHOICES, required=False)
 
     class Meta:
         model = Car
         fields = ['car_make', 'car_model', 'car_images' , 'year', 'price', 'description', 'body',
-                  'fuel', 'rudder', 'gearbox', 'color', 'car_review', 'avg_rating', 'count_people', 'date_registered']
+                  'fuel', 'rudder', 'gearbox', 'color', 'car_review', 'avg_rating', 'count_people',
+                  'rating_histogram', 'date_registered']
 
     def get_count_people(self, obj):
         return obj.get_count_people()
@@ -164,20 +234,27 @@ class CarDetailSerializer(serializers.ModelSerializer):
     def get_avg_rating(self, obj):
         return obj.get_avg_rating()
 
+    def get_rating_histogram(self, obj):
+        return obj.get_rating_histogram()
+
 class CarModelDetailSerializer(serializers.ModelSerializer):
-    model = CarListSerializer(many=True, read_only=True)
+    model = NestedPageField(CarListSerializer, 'car_model_cars')
 
     class Meta:
         model = CarModel
         fields = ['car_model', 'model']
 
 
-class CarMakeDetailSerializer(serializers.ModelSerializer):
-    makes = CarListSerializer(many=True, read_only=True)
-    car_makes = CarModelListSerializer(many=True, read_only=True)
+class CarMakeDetailSerializer(ImageVariantMixin, serializers.ModelSerializer):
+    makes = NestedPageField(CarListSerializer, 'car_make_cars')
+    car_makes = NestedPageField(CarModelListSerializer, 'car_make_models')
+    car_image = serializers.SerializerMethodField()
     class Meta:
         model = CarMake
-        fields = ['car_name', 'makes', 'car_makes']
+        fields = ['car_name', 'car_image', 'makes', 'car_makes']
+
+    def get_car_image(self, obj):
+        return self.get_variant_url(obj.car_image, obj.car_image_variants)
 
 
 class CarReviewCreateSerializer(serializers.ModelSerializer):
@@ -186,8 +263,12 @@ class CarReviewCreateSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class CartCarSerializer(CarListSerializer):
+    car_images = CarImageListSerializer(many=True, read_only=True, source='first_images')
+
+
 class CartItemSerializer(serializers.ModelSerializer):
-    car = CarListSerializer(read_only=True)
+    car = CartCarSerializer(read_only=True)
     car_id = serializers.PrimaryKeyRelatedField(queryset=Car.objects.all(), write_only=True, source='car')
 
     class Meta:
@@ -197,13 +278,22 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 class CartSerializer(serializers.ModelSerializer):
     cart_item = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField()
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, source='get_total_price', read_only=True)
     class Meta:
         model = Cart
         fields = ['id', 'client', 'cart_item', 'total_price']
 
-    def get_total_price(self, obj):
-        return obj.get_total_price()
+
+class CartBatchSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=500)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=500)
+
+    def validate_add(self, value):
+        value = list(dict.fromkeys(value))
+        missing = set(value) - set(Car.objects.filter(pk__in=value).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(f'Unknown car ids: {sorted(missing)}')
+        return value
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -0,0 +1,196 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .models import UserProfile, Category, Car, CarMake, CarModel, CarImage, CarReview
+from .ratings import apply_review
+from .search import get_backend
+from .facets import invalidate_facets
+from .cache import invalidate_tags
+from .authentication import invalidate_user
+from .tokens import BLACKLIST_TAG
+from .cards import invalidate_cards, refresh_cards
+from .images import needs_variants, process_car_image, process_car_make, schedule
+
+
+TRACKED_FIELDS = {
+    Car: ('car_make_id', 'car_model_id'),
+    CarMake: ('category_id',),
+    CarModel: ('car_make_id', 'category_id'),
+    CarImage: ('car_id',),
+}
+
+
+def previous(instance, field):
+    return getattr(instance, '_previous', {}).get(field)
+
+
+def car_tags(car_ids):
+    tags = []
+    rows = Car.objects.filter(pk__in=[pk for pk in car_ids if pk]).values_list('pk', 'car_make_id', 'car_model_id')
+    for pk, car_make_id, car_model_id in rows:
+        tags += [f'car:{pk}', f'car_make:{car_make_id}', f'car_model:{car_model_id}']
+    return tags
+
+
+def cars_changed(car_ids, previous=(), using=None):
+    """Refresh search, facets and cached responses after bulk writes that skip model signals."""
+    get_backend(using).index(car_ids, using)
+    invalidate_facets()
+    invalidate_cards(car_ids)
+    invalidate_tags(
+        *car_tags(car_ids),
+        *(tag for car_make_id, car_model_id in previous
+          for tag in (f'car_make:{car_make_id}', f'car_model:{car_model_id}')),
+    )
+
+
+def catalog_changed(category_ids=()):
+    invalidate_tags('category', 'car_make', 'car_model', *(f'category:{pk}' for pk in category_ids if pk))
+
+
+@receiver(pre_save)
+def remember_previous(sender, instance, **kwargs):
+    fields = TRACKED_FIELDS.get(sender)
+    if fields and instance.pk:
+        instance._previous = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+@receiver(pre_save, sender=CarReview)
+def review_saving(sender, instance, **kwargs):
+    if instance.pk and not hasattr(instance, '_loaded_rating'):
+        instance._loaded_rating = CarReview.objects.filter(pk=instance.pk).values_list('car_id', 'stars').first()
+
+
+@receiver(post_save, sender=CarReview)
+def review_saved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_rating', None)
+    current = (instance.car_id, instance.stars)
+    invalidate_tags(f'car:{instance.car_id}', loaded and f'car:{loaded[0]}')
+    if loaded == current:
+        return
+    if loaded and not created:
+        apply_review(*loaded, -1)
+    apply_review(*current, 1)
+    instance._loaded_rating = current
+
+
+@receiver(pre_delete, sender=CarReview)
+def review_deleting(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Car) or getattr(origin, 'model', None) is Car:
+        return
+    if not hasattr(instance, '_loaded_rating'):
+        instance._loaded_rating = CarReview.objects.filter(pk=instance.pk).values_list('car_id', 'stars').first()
+
+
+@receiver(post_delete, sender=CarReview)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Car) or getattr(origin, 'model', None) is Car:
+        return
+    car_id, stars = getattr(instance, '_loaded_rating', None) or (instance.car_id, instance.stars)
+    apply_review(car_id, stars, -1)
+    invalidate_tags(f'car:{car_id}')
+
+
+@receiver(post_save, sender=Car)
+def car_saved(sender, instance, using, **kwargs):
+    get_backend(using).index([instance.pk], using)
+    invalidate_facets()
+    invalidate_car(instance)
+    refresh_cards([instance.pk])
+
+
+@receiver(post_delete, sender=Car)
+def car_deleted(sender, instance, using, **kwargs):
+    get_backend(using).remove([instance.pk], using)
+    invalidate_facets()
+    invalidate_car(instance)
+
+
+def invalidate_car(instance):
+    invalidate_tags(
+        f'car:{instance.pk}',
+        f'car_make:{instance.car_make_id}', f'car_model:{instance.car_model_id}',
+        previous(instance, 'car_make_id') and f'car_make:{previous(instance, "car_make_id")}',
+        previous(instance, 'car_model_id') and f'car_model:{previous(instance, "car_model_id")}',
+    )
+
+
+@receiver(post_save, sender=CarMake)
+def car_make_saved(sender, instance, created, using, **kwargs):
+    if not created:
+        get_backend(using).index(instance.makes.values_list('pk', flat=True), using)
+        invalidate_cards(instance.makes.values_list('pk', flat=True))
+    invalidate_car_make(instance)
+    if needs_variants(instance.car_image, instance.car_image_variants):
+        schedule(process_car_make, instance.pk)
+
+
+@receiver(post_delete, sender=CarMake)
+def car_make_deleted(sender, instance, **kwargs):
+    invalidate_car_make(instance)
+
+
+def invalidate_car_make(instance):
+    invalidate_tags(
+        'car_make', f'car_make:{instance.pk}',
+        instance.category_id and f'category:{instance.category_id}',
+        previous(instance, 'category_id') and f'category:{previous(instance, "category_id")}',
+    )
+
+
+@receiver(post_save, sender=CarModel)
+def car_model_saved(sender, instance, created, using, **kwargs):
+    if not created:
+        get_backend(using).index(instance.model.values_list('pk', flat=True), using)
+        invalidate_cards(instance.model.values_list('pk', flat=True))
+    invalidate_car_model(instance)
+
+
+@receiver(post_delete, sender=CarModel)
+def car_model_deleted(sender, instance, **kwargs):
+    invalidate_car_model(instance)
+
+
+def invalidate_car_model(instance):
+    invalidate_tags(
+        'car_model', f'car_model:{instance.pk}', f'car_make:{instance.car_make_id}',
+        instance.category_id and f'category:{instance.category_id}',
+        previous(instance, 'car_make_id') and f'car_make:{previous(instance, "car_make_id")}',
+        previous(instance, 'category_id') and f'category:{previous(instance, "category_id")}',
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_tags('category', f'category:{instance.pk}')
+
+
+@receiver(post_save, sender=CarImage)
+def car_image_saved(sender, instance, **kwargs):
+    if needs_variants(instance.image, instance.variants):
+        schedule(process_car_image, instance.pk)
+
+
+@receiver(post_save, sender=CarImage)
+@receiver(post_delete, sender=CarImage)
+def car_image_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Car) or getattr(origin, 'model', None) is Car:
+        return
+    invalidate_tags(*car_tags([instance.car_id, previous(instance, 'car_id')]))
+    refresh_cards([instance.car_id, previous(instance, 'car_id')])
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def user_changed(sender, instance, **kwargs):
+    if isinstance(instance, UserProfile):
+        invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, **kwargs):
+    # other processes can only read the row once it is committed
+    transaction.on_commit(lambda: invalidate_tags(BLACKLIST_TAG))
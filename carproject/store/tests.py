@@ -1,3 +1,1144 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from time import monotonic, sleep
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.translation import gettext_lazy
+
+from PIL import Image
+from phonenumber_field.phonenumber import PhoneNumber
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .authentication import get_cached_user
+from .filters import CarFilter
+from .benchmark import SCENARIOS, Fixture, InProcessTransport, compare, run_benchmark, seed
+from .cache import single_flight
+from .cards import CarCardRenderer, rebuild_cards, with_card_renderer
+from .history import recorder
+from .middleware import QueryStats
+from .renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from .values import (
+    CarListValuesSerializer, CarMakeListValuesSerializer, CarModelListValuesSerializer, CategoryListValuesSerializer,
+)
+from .serializers import CarSerializer
+from .views import CarDetailAPIView, car_list_queryset
+from .routers import STICKY_COOKIE, PrimaryReplicaRouter, check_writer_cache, replica_reads
+from .tokens import RefreshToken, blacklist
+from .models import (
+    Client, Owner, CarMake, CarModel, Category, Car, CarCard, CarImage, CarReview, Cart, CartItem, History
+)
+
+
+def create_catalog(cars, images=2, reviews=2):
+    category = Category.objects.create(category_name='Кроссовер')
+    make = CarMake.objects.create(car_name='BMW', category=category)
+    model = CarModel.objects.create(car_model='X5', car_make=make, category=category)
+    users = [
+        Client.objects.create_user(username=f'client{i}', password='pass12345', first_name=f'Name{i}')
+        for i in range(reviews)
+    ]
+    created = []
+    for i in range(cars):
+        car = Car.objects.create(
+            car_make=make, car_model=model, description='описание',
+            price=Decimal('10000.00') + i, year=2015 + i % 10,
+        )
+        CarImage.objects.bulk_create(
+            CarImage(car=car, image=f'images/car_{i}_{j}.jpeg') for j in range(images)
+        )
+        CarReview.objects.bulk_create(
+            CarReview(car=car, user=user, text='ok', stars=1 + j % 5) for j, user in enumerate(users)
+        )
+        created.append(car)
+    return category, make, model, created
+
+
+@override_settings(STORE_HISTORY_FLUSH_INTERVAL=0, DATABASE_REPLICAS=[])
+class StoreTestCase(TestCase):
+    # replica routing is off unless a test case turns DATABASE_REPLICAS back on
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        translation.activate(settings.LANGUAGE_CODE)
+        recorder.clear()
+
+
+class QueryBudgetTests(StoreTestCase):
+    """Each endpoint must issue the same number of queries for 2 rows as for 200."""
+
+    def assertQueryBudget(self, budget, build_url, small=2, large=200):
+        for size in (small, large):
+            Car.objects.all().delete()
+            CarMake.objects.all().delete()
+            Category.objects.all().delete()
+            Client.objects.all().delete()
+            cache.clear()
+            url = build_url(*create_catalog(size))
+            with self.subTest(rows=size), self.assertNumQueries(budget):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_car_list(self):
+        def build_url(category, make, model, cars):
+            rebuild_cards()
+            return reverse('car_list') + f'?limit={len(cars)}'
+
+        # count, car ids, cards
+        self.assertQueryBudget(3, build_url)
+
+    def test_car_detail(self):
+        self.assertQueryBudget(
+            # car with make/model, images, reviews with users
+            3, lambda category, make, model, cars: reverse('car_detail', args=[cars[-1].pk])
+        )
+
+    def test_car_make_detail(self):
+        self.assertQueryBudget(
+            # make, car count, first cars, their images, model count, first models, models of the cars
+            7, lambda category, make, model, cars: reverse('car_make_detail', args=[make.pk])
+        )
+
+    def test_car_model_detail(self):
+        self.assertQueryBudget(
+            # model, car count, first cars, their images, makes of the cars
+            5, lambda category, make, model, cars: reverse('car_model_detail', args=[model.pk])
+        )
+
+    def test_category_detail(self):
+        self.assertQueryBudget(
+            # category, make count, first makes, model count, first models
+            5, lambda category, make, model, cars: reverse('category_detail', args=[category.pk])
+        )
+
+    def test_cart(self):
+        def build_url(category, make, model, cars):
+            client = Client.objects.first()
+            cart = Cart.objects.create(client=client)
+            CartItem.objects.bulk_create(CartItem(cart=cart, car=car) for car in cars)
+            self.client = APIClient()
+            self.client.force_authenticate(client)
+            return reverse('cart_list')
+
+        # cart with total, items with car/make/model, first image per car
+        self.assertQueryBudget(3, build_url)
+
+
+class RatingAggregateTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, make, model, (self.car, self.other) = create_catalog(2, images=0, reviews=0)
+        self.user = Client.objects.create_user(username='reviewer', password='pass12345')
+
+    def assertRating(self, car, count, total, histogram):
+        car.refresh_from_db()
+        self.assertEqual((car.review_count, car.rating_sum), (count, total))
+        self.assertEqual(list(car.get_rating_histogram().values()), histogram)
+
+    def test_create_edit_delete(self):
+        review = CarReview.objects.create(car=self.car, user=self.user, text='ok', stars=4)
+        CarReview.objects.create(car=self.car, user=self.user, text='ok', stars=2)
+        self.assertRating(self.car, 2, 6, [0, 1, 0, 1, 0])
+        self.assertEqual(self.car.get_avg_rating(), 3.0)
+
+        review = CarReview.objects.get(pk=review.pk)
+        review.stars = 5
+        review.save()
+        self.assertRating(self.car, 2, 7, [0, 1, 0, 0, 1])
+
+        review.car = self.other
+        review.save()
+        self.assertRating(self.car, 1, 2, [0, 1, 0, 0, 0])
+        self.assertRating(self.other, 1, 5, [0, 0, 0, 0, 1])
+
+        review.delete()
+        self.assertRating(self.other, 0, 0, [0, 0, 0, 0, 0])
+        self.assertIsNone(self.other.get_avg_rating())
+
+    def test_deferred_stars_are_read_before_delete(self):
+        review = CarReview.objects.create(car=self.car, user=self.user, text='ok', stars=4)
+        review = CarReview.objects.defer('stars').get(pk=review.pk)
+        self.assertFalse(hasattr(review, '_loaded_rating'))
+        review.delete()
+        self.assertRating(self.car, 0, 0, [0, 0, 0, 0, 0])
+
+    def test_rebuild_command(self):
+        CarReview.objects.bulk_create(
+            CarReview(car=self.car, user=self.user, text='ok', stars=stars) for stars in (1, 3, 3)
+        )
+        Car.objects.filter(pk=self.other.pk).update(review_count=7, rating_sum=9)
+        call_command('rebuild_car_ratings', stdout=StringIO())
+        self.assertRating(self.car, 3, 7, [1, 0, 2, 0, 0])
+        self.assertRating(self.other, 0, 0, [0, 0, 0, 0, 0])
+
+    def test_list_sorts_and_filters_by_rating(self):
+        CarReview.objects.create(car=self.car, user=self.user, text='ok', stars=2)
+        CarReview.objects.create(car=self.other, user=self.user, text='ok', stars=5)
+        response = self.client.get(reverse('car_list') + '?ordering=-rating')
+        self.assertEqual([car['id'] for car in response.json()['results']], [self.other.pk, self.car.pk])
+        response = self.client.get(reverse('car_list') + '?rating__gt=3')
+        self.assertEqual([car['id'] for car in response.json()['results']], [self.other.pk])
+
+
+class CursorPaginationTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, make, model, self.cars = create_catalog(7, images=1, reviews=0)
+        # duplicate prices so the date_registered/id tie-breakers matter
+        Car.objects.filter(pk__in=[car.pk for car in self.cars[:4]]).update(price=Decimal('500.00'))
+        # and duplicate ratings and review counts, with unrated cars
+        for car, (count, total) in zip(self.cars, [(0, 0), (2, 8), (1, 4), (2, 6), (0, 0), (3, 9), (1, 5)]):
+            Car.objects.filter(pk=car.pk).update(review_count=count, rating_sum=total)
+
+    def walk(self, url):
+        seen, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            seen += [car['id'] for car in data['results']]
+            pages.append(data)
+            url = data['next']
+        return seen, pages
+
+    def test_walks_every_ordering_forward_and_back(self):
+        for ordering, expected in [
+            ('', Car.objects.order_by('-date_registered', '-id')),
+            ('&ordering=price', Car.objects.order_by('price', 'date_registered', 'id')),
+            ('&ordering=-price', Car.objects.order_by('-price', '-date_registered', '-id')),
+            ('&ordering=rating', sorted(Car.objects.with_rating(), key=lambda car: (car.rating or 0, car.pk))),
+            ('&ordering=-rating', sorted(
+                Car.objects.with_rating(), key=lambda car: (car.rating or 0, car.pk), reverse=True,
+            )),
+            ('&ordering=-rating&fields=id', sorted(
+                Car.objects.with_rating(), key=lambda car: (car.rating or 0, car.pk), reverse=True,
+            )),
+            ('&ordering=review_count', Car.objects.order_by('review_count', 'id')),
+            ('&ordering=-review_count', Car.objects.order_by('-review_count', '-id')),
+        ]:
+            with self.subTest(ordering=ordering):
+                seen, pages = self.walk(reverse('car_list') + '?pagination=cursor&limit=2' + ordering)
+                self.assertEqual(seen, [car.pk for car in expected])
+                previous = self.client.get(pages[-1]['previous']).json()
+                self.assertEqual(previous['results'], pages[-2]['results'])
+
+    def test_respects_filters(self):
+        seen, pages = self.walk(reverse('car_list') + '?cursor=&limit=2&ordering=price&price__lt=600')
+        self.assertEqual(seen, [car.pk for car in self.cars[:4]])
+
+    def test_page_cost_is_constant(self):
+        rebuild_cards()
+        response = self.client.get(reverse('car_list') + '?pagination=cursor&limit=2')
+        # car ids, cards; no COUNT(*)
+        with self.assertNumQueries(2):
+            self.client.get(response.data['next'])
+
+    def test_invalid_cursor_and_ordering(self):
+        self.assertEqual(self.client.get(reverse('car_list') + '?cursor=garbage').status_code, 404)
+        self.assertEqual(self.client.get(reverse('car_list') + '?cursor=&ordering=year').status_code, 400)
+
+
+class CarCardTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, self.make, model, self.cars = create_catalog(3, images=2, reviews=0)
+
+    def test_cards_match_serializer_output(self):
+        url = reverse('car_list') + '?limit=10&ordering=-price'
+        self.assertEqual(CarCard.objects.count(), 0)
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.content, self.client.get(url + '&image_size=thumb').content)
+        self.assertEqual(CarCard.objects.filter(language='ru').count(), 3)
+        self.assertIn(b'"image":"http://testserver/media/images/car_2_0.jpeg"', response.content)
+
+        english = self.client.get(url.replace('/ru/', '/en/'))
+        self.assertEqual(english.json()['results'], response.json()['results'])
+        self.assertEqual(CarCard.objects.filter(language='en').count(), 3)
+
+    def test_changes_refresh_cards(self):
+        url = reverse('car_list') + '?limit=10'
+        self.client.get(url)
+        car = self.cars[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            car.price = Decimal('1.00')
+            car.save()
+        self.assertIn('"price":"1.00"', CarCard.objects.get(car=car, language='ru').body)
+
+        self.make.car_name = 'Mercedes'
+        self.make.save()
+        self.assertEqual(CarCard.objects.count(), 0)
+        CarImage.objects.filter(car=car).first().delete()
+        results = {row['id']: row for row in self.client.get(url).json()['results']}
+        self.assertEqual(results[car.pk]['car_make']['car_name'], 'Mercedes')
+        self.assertEqual(len(results[car.pk]['car_images']), 1)
+
+    def test_pages_compute_the_rating_only_when_they_use_it(self):
+        rebuild_cards()
+        for query, computed in [('', False), ('?ordering=price', False), ('?ordering=-rating', True),
+                                ('?rating__gt=1', True), ('?pagination=cursor&ordering=rating', True)]:
+            with self.subTest(query=query), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(reverse('car_list') + query).status_code, 200)
+            self.assertEqual(any('CASE WHEN' in query['sql'] for query in queries), computed)
+
+    def test_card_renderer_replaces_only_the_json_renderer(self):
+        self.assertEqual(
+            with_card_renderer([MessagePackRenderer, BrowsableAPIRenderer, ORJSONRenderer, JSONRenderer]),
+            [CarCardRenderer, MessagePackRenderer, BrowsableAPIRenderer],
+        )
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_car_cards', batch_size=2, stdout=out)
+        self.assertIn('Rebuilt cards of 3 cars', out.getvalue())
+        self.assertEqual(CarCard.objects.count(), 3 * len(settings.LANGUAGES))
+
+
+class RendererTests(StoreTestCase):
+    def test_matches_drf_json_renderer(self):
+        data = {
+            'price': Decimal('10.50'), 'histogram': {1: 2, 5: 0}, 'name': gettext_lazy('Name'),
+            'date': timezone.make_aware(datetime(2024, 5, 1, 12, 30, 15, 123456), dt_timezone.utc),
+            'day': date(2024, 5, 1), 'at': time(8, 15, 30, 250000), 'id': uuid.UUID(int=7),
+            'text': 'Тойота\u2028', 'cars': Car.objects.none(),
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        phone = PhoneNumber.from_string('+996555123456')
+        self.assertEqual(ORJSONRenderer().render({'phone': phone}), b'{"phone":"+996555123456"}')
+
+    def test_negotiation(self):
+        category, make, model, cars = create_catalog(1, images=0, reviews=0)
+        url = reverse('car_make_detail', args=[make.pk])
+        self.assertEqual(self.client.get(url).content, JSONRenderer().render(self.client.get(url).json()))
+        self.assertIn(b'\n    "car_name"', self.client.get(url, HTTP_ACCEPT='application/json; indent=4').content)
+        response = self.client.post(reverse('login'), '{"username": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_messagepack(self):
+        category, make, model, cars = create_catalog(1, images=0, reviews=0)
+        url = reverse('car_make_detail', args=[make.pk])
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(url).json())
+
+
+class ValuesSerializerTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, self.make, self.model, self.cars = create_catalog(3, images=2, reviews=1)
+        CarImage.objects.filter(pk=CarImage.objects.first().pk).update(
+            variants={'thumb': 'images/a.thumb.jpg', 'thumb_webp': 'images/a.thumb.webp', 'source': 'images/a.jpeg'},
+        )
+        Category.objects.create(category_name_ru='Седан', category_name_en='Sedan')
+        # names that do not sort in id order
+        for name, model in [('Toyota', 'Camry'), ('Audi', 'A4')]:
+            make = CarMake.objects.create(car_name=name, category=category)
+            CarModel.objects.create(car_model=model, car_make=make, category=category)
+
+    def assertSameOutput(self, values_serializer_class, queryset, query=''):
+        request = Request(APIRequestFactory().get('/' + query))
+        context = {'request': request}
+        expected = values_serializer_class.serializer_class(queryset, many=True, context=context).data
+        serializer = values_serializer_class(context=context)
+        fast = serializer.to_representation(serializer.rows(queryset))
+        self.assertEqual(ORJSONRenderer().render(fast), ORJSONRenderer().render(expected))
+
+    def test_matches_model_serializers(self):
+        for query in ['', '?image_size=original', '?image_size=medium&image_format=webp']:
+            with self.subTest(query=query):
+                self.assertSameOutput(CarListValuesSerializer, car_list_queryset().order_by('-price'), query)
+        self.assertSameOutput(CarMakeListValuesSerializer, CarMake.objects.all())
+        self.assertSameOutput(CarModelListValuesSerializer, CarModel.objects.all())
+        for language in ['ru', 'en']:
+            with self.subTest(language=language), translation.override(language):
+                self.assertSameOutput(CategoryListValuesSerializer, Category.objects.all())
+
+    def test_list_endpoints(self):
+        url = reverse('car_list') + '?image_size=original&ordering=-price&limit=10'
+        # count, cars with make/model, images
+        with self.assertNumQueries(3):
+            results = self.client.get(url).json()['results']
+        self.assertEqual([row['id'] for row in results], [car.pk for car in reversed(self.cars)])
+        self.assertEqual(len(results[0]['car_images']), 2)
+        response = self.client.get(reverse('category_list').replace('/ru/', '/en/'), {'limit': 10})
+        self.assertEqual([row['category_name'] for row in response.json()['results']], ['Кроссовер', 'Sedan'])
+
+
+@override_settings(STORE_NESTED_PAGE_SIZE=2)
+class NestedPageTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category, self.make, self.model, self.cars = create_catalog(5, images=1, reviews=0)
+        CarModel.objects.create(car_model='X6', car_make=self.make, category=self.category)
+        CarModel.objects.create(car_model='X7', car_make=self.make, category=self.category)
+
+    def test_details_embed_first_page(self):
+        data = self.client.get(reverse('car_make_detail', args=[self.make.pk])).json()
+        self.assertEqual(data['makes']['count'], 5)
+        self.assertEqual([car['id'] for car in data['makes']['results']], [car.pk for car in self.cars[:2]])
+        self.assertEqual(data['makes']['url'], 'http://testserver' + reverse('car_make_cars', args=[self.make.pk]))
+        self.assertEqual(self.client.get(data['makes']['url']).json()['results'], data['makes']['results'])
+        self.assertEqual(data['car_makes']['count'], 3)
+        self.assertEqual([model['car_model'] for model in data['car_makes']['results']], ['X5', 'X6'])
+
+        data = self.client.get(reverse('car_model_detail', args=[self.model.pk])).json()
+        self.assertEqual((data['model']['count'], len(data['model']['results'])), (5, 2))
+        data = self.client.get(reverse('category_detail', args=[self.category.pk])).json()
+        self.assertEqual((data['category_make']['count'], data['category_model']['count']), (1, 3))
+        self.assertEqual(len(data['category_model']['results']), 2)
+
+    def test_sub_resources(self):
+        url = reverse('car_make_cars', args=[self.make.pk])
+        data = self.client.get(url, {'price__gt': 10001, 'limit': 10}).json()
+        self.assertEqual([car['id'] for car in data['results']], [car.pk for car in self.cars[2:]])
+        data = self.client.get(reverse('car_model_cars', args=[self.model.pk]), {'ordering': '-price'}).json()
+        self.assertEqual([car['id'] for car in data['results']], [self.cars[4].pk, self.cars[3].pk])
+        self.assertEqual(self.client.get(reverse('car_make_models', args=[self.make.pk])).json()['count'], 3)
+        self.assertEqual(self.client.get(reverse('category_makes', args=[self.category.pk])).json()['count'], 1)
+        self.assertEqual(self.client.get(reverse('category_models', args=[self.category.pk])).json()['count'], 3)
+        self.assertEqual(self.client.get(reverse('car_make_cars', args=[999])).status_code, 404)
+
+
+class CarFieldsTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, self.make, self.model, self.cars = create_catalog(2, images=2, reviews=1)
+        self.images = [image.pk for image in self.cars[0].car_images.order_by('pk')]
+
+    def test_car_list(self):
+        url = reverse('car_list')
+        # count, cars
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {'fields': 'id,price'}).json()
+        self.assertEqual(data['results'][0], {'id': self.cars[0].pk, 'price': '10000.00'})
+
+        data = self.client.get(url, {'fields': 'id,car_make,car_images', 'expand': 'car_make'}).json()
+        self.assertEqual(data['results'][0], {
+            'id': self.cars[0].pk, 'car_make': {'id': self.make.pk, 'car_name': 'BMW'}, 'car_images': self.images,
+        })
+        response = self.client.get(url, {'fields': 'id,description', 'expand': 'year'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+
+    def test_car_detail(self):
+        url = reverse('car_detail', args=[self.cars[0].pk])
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url, {'fields': 'price,description,car_review', 'expand': ''}).json()
+        self.assertEqual(data, {
+            'price': '10000.00', 'description': 'описание', 'car_review': [self.cars[0].car_review.get().pk],
+        })
+        # car, review ids; only the active language's description is read
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('description_en', queries[0]['sql'])
+        data = self.client.get(url.replace('/ru/', '/en/'), {'fields': 'description'}).json()
+        self.assertEqual(data, {'description': 'описание'})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, {'fields': 'price'}).json(), {'price': '10000.00'})
+        self.assertNotIn('description', queries[0]['sql'])
+
+    def test_nested_and_cart(self):
+        data = self.client.get(reverse('car_make_detail', args=[self.make.pk]), {'fields': 'id,year'}).json()
+        self.assertEqual(data['makes']['results'], [{'id': car.pk, 'year': car.year} for car in self.cars])
+        self.assertEqual(data['car_makes']['results'], [{'id': self.model.pk, 'car_model': 'X5'}])
+
+        client = APIClient()
+        client.force_authenticate(Client.objects.get())
+        client.post(reverse('cart_batch'), {'add': [self.cars[0].pk]}, format='json')
+        data = client.get(reverse('cart_list'), {'fields': 'id,car_model,car_images', 'expand': ''}).json()
+        self.assertEqual(data['cart_item'][0]['car'], {
+            'id': self.cars[0].pk, 'car_model': self.model.pk, 'car_images': self.images[:1],
+        })
+
+
+class SearchTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, self.make, self.model, (self.car, self.other) = create_catalog(2, images=0, reviews=0)
+        self.other.description_en = 'Panoramic roof, leather seats'
+        self.other.save()
+
+    def search(self, query, language='ru'):
+        url = reverse('car_list').replace('/ru/', f'/{language}/')
+        return [car['id'] for car in self.client.get(url, {'search': query}).json()['results']]
+
+    def test_matches_make_model_and_translations(self):
+        self.assertEqual(sorted(self.search('bmw x5')), sorted([self.car.pk, self.other.pk]))
+        self.assertEqual(self.search('leath'), [self.other.pk])
+        self.assertEqual(len(self.search('ОПИСАНИЕ', 'en')), 2)
+        self.assertEqual(self.search('mercedes'), [])
+
+    def test_index_follows_renames_and_deletes(self):
+        self.make.car_name = 'Mercedes'
+        self.make.save()
+        self.assertEqual(len(self.search('mercedes')), 2)
+        self.other.delete()
+        self.assertEqual(self.search('mercedes'), [self.car.pk])
+
+    def test_ranks_better_matches_first(self):
+        self.car.description_ru = 'кожа кожа кожа'
+        self.car.save()
+        self.other.description_ru = 'кожа и многое другое в этом длинном описании автомобиля'
+        self.other.save()
+        self.assertEqual(self.search('кожа'), [self.car.pk, self.other.pk])
+
+
+class FacetTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, self.make, model, self.cars = create_catalog(3, images=0, reviews=0)
+        Car.objects.filter(pk=self.cars[0].pk).update(body='седан', fuel='бензин,гибрид', price=Decimal('750000'))
+
+    def facet(self, data, field, value):
+        return next(item['count'] for item in data[field] if item['value'] == value)
+
+    def test_counts_every_dimension_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('car_facets'), {'year__gt': 2000}).data
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(self.facet(data, 'body', 'седан'), 1)
+        self.assertEqual(self.facet(data, 'body', 'любое'), 2)
+        self.assertEqual(self.facet(data, 'fuel', 'гибрид'), 1)
+        self.assertEqual(self.facet(data, 'rudder', 'слева'), 3)
+        self.assertEqual(data['price']['max'], '750000.00')
+        self.assertEqual([bucket['count'] for bucket in data['price']['histogram']], [2, 1, 0, 0, 0])
+        self.assertEqual(data['year']['histogram'][-1], {'min': 2020, 'max': None, 'count': 0})
+
+    def test_applies_car_filter(self):
+        data = self.client.get(reverse('car_facets'), {'price__gt': 500000}).data
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(self.facet(data, 'fuel', 'бензин'), 1)
+
+    def test_unfiltered_facets_are_cached_until_a_car_changes(self):
+        self.client.get(reverse('car_facets'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('car_facets')).data['count'], 3)
+        self.cars[1].delete()
+        self.assertEqual(self.client.get(reverse('car_facets')).data['count'], 2)
+
+
+class ResponseCacheTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category, self.make, self.model, (self.car,) = create_catalog(1, images=1, reviews=1)
+
+    def assertCached(self, url):
+        first = self.client.get(url).data
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, first)
+        return first
+
+    def test_car_detail_is_invalidated_by_related_writes(self):
+        url = reverse('car_detail', args=[self.car.pk])
+        self.assertCached(url)
+
+        CarImage.objects.create(car=self.car, image='images/new.jpeg')
+        self.assertEqual(len(self.assertCached(url)['car_images']), 2)
+
+        CarReview.objects.create(car=self.car, user=Client.objects.get(), text='ok', stars=5)
+        self.assertEqual(len(self.assertCached(url)['car_review']), 2)
+
+        self.make.car_name = 'Mercedes'
+        self.make.save()
+        self.assertEqual(self.assertCached(url)['car_make']['car_name'], 'Mercedes')
+
+        reviewer = Client.objects.get()
+        reviewer.first_name = 'Renamed'
+        reviewer.save()
+        self.assertEqual(self.assertCached(url)['car_review'][0]['user']['first_name'], 'Renamed')
+
+    def test_entries_are_per_language_and_query(self):
+        url = reverse('category_list')
+        self.assertCached(url)
+        self.assertCached(url.replace('/ru/', '/en/'))
+        self.assertCached(url + '?search=Кросс')
+        self.category.category_name_en = 'Crossover'
+        self.category.save()
+        self.assertEqual(self.client.get(url.replace('/ru/', '/en/')).data['results'][0]['category_name'], 'Crossover')
+
+    def test_unrelated_writes_keep_entries(self):
+        url = reverse('car_make_detail', args=[self.make.pk])
+        self.assertCached(url)
+        other = CarMake.objects.create(car_name='Lexus')
+        model = CarModel.objects.create(car_model='RX', car_make=other)
+        Car.objects.create(car_make=other, car_model=model, description='', price=1, year=2020)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_waiters_reuse_the_entry_computed_by_the_lock_holder(self):
+        calls = []
+        entry = {'data': 1, 'tags': {}}
+        cache.add('store:test:lock', 1)
+        threading.Timer(0.1, cache.set, ['store:test', entry]).start()
+        self.assertEqual(single_flight('store:test', lambda: calls.append(1), 60), entry)
+        self.assertEqual(calls, [])
+
+    def test_waiters_stop_polling_when_nothing_is_cached(self):
+        def compute():
+            sleep(0.1)
+
+        def request():
+            started = monotonic()
+            single_flight('store:test', compute, 60, wait=5)
+            elapsed.append(monotonic() - started)
+
+        elapsed = []
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(elapsed), 3)
+        self.assertLess(max(elapsed), 1)
+
+
+@override_settings(STORE_IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        category, make, model, (self.car,) = create_catalog(1, images=0, reviews=0)
+
+    def upload(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(buffer, 'JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            image = CarImage.objects.create(
+                car=self.car, image=SimpleUploadedFile('photo.jpeg', buffer.getvalue())
+            )
+        image.refresh_from_db()
+        return image
+
+    def test_upload_generates_variants(self):
+        image = self.upload()
+        self.assertEqual(image.variants['source'], image.image.name)
+        for key, size in [('thumb', (320, 240)), ('medium_webp', (800, 600))]:
+            with image.image.storage.open(image.variants[key]) as variant:
+                self.assertEqual(Image.open(variant).size, size)
+
+    def test_list_serves_thumbnails_by_default(self):
+        image = self.upload()
+        url = reverse('car_list')
+        served = self.client.get(url).json()['results'][0]['car_images'][0]['image']
+        self.assertTrue(served.endswith(image.variants['thumb']))
+        served = self.client.get(url, {'image_size': 'original'}).json()['results'][0]['car_images'][0]['image']
+        self.assertTrue(served.endswith(image.image.name))
+        served = self.client.get(url, {'image_format': 'webp'}).json()['results'][0]['car_images'][0]['image']
+        self.assertTrue(served.endswith(image.variants['thumb_webp']))
+
+    def test_backfill_command(self):
+        image = self.upload()
+        CarImage.objects.filter(pk=image.pk).update(variants={})
+        call_command('generate_image_variants', workers=1, stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual(set(image.variants), {'thumb', 'thumb_webp', 'medium', 'medium_webp', 'source'})
+
+
+class ImportCarsTests(StoreTestCase):
+    def write(self, name, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as feed:
+            feed.write(content)
+        return path
+
+    def test_creates_then_upserts_by_external_id(self):
+        csv_path = self.write('feed.csv', (
+            'external_id,make,model,category,price,year,fuel,description_ru,description_en\n'
+            'A1,Toyota,Camry,Седан,25000,2020,бензин|гибрид,Надежная,Reliable\n'
+            'A2,Toyota,RAV4,Кроссовер,31000,2021,бензин,,\n'
+            'A3,Toyota,,Кроссовер,1,2021,,,\n'
+        ))
+        out = StringIO()
+        call_command('import_cars', csv_path, batch_size=2, stdout=out, stderr=StringIO())
+        self.assertIn('2 created, 0 updated, 1 skipped', out.getvalue())
+        camry = Car.objects.get(external_id='A1')
+        self.assertEqual((camry.car_make.car_name, camry.car_model.car_model), ('Toyota', 'Camry'))
+        self.assertEqual(list(camry.fuel), ['бензин', 'гибрид'])
+        self.assertEqual(camry.description_en, 'Reliable')
+        self.assertEqual(CarMake.objects.count(), 1)
+        self.assertEqual(Category.objects.count(), 2)
+
+        jsonl_path = self.write('feed.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'external_id': 'A1', 'make': 'Toyota', 'model': 'Camry', 'price': '24000', 'year': 2020},
+            {'external_id': 'B1', 'make': 'Lexus', 'model': 'RX', 'price': '50000', 'year': 2022},
+        ]))
+        out = StringIO()
+        call_command('import_cars', jsonl_path, stdout=out)
+        self.assertIn('1 created, 1 updated', out.getvalue())
+        camry.refresh_from_db()
+        self.assertEqual(camry.price, Decimal('24000'))
+        self.assertEqual(Car.objects.count(), 3)
+        self.assertEqual(self.client.get(reverse('car_list'), {'search': 'lexus'}).data['count'], 1)
+
+    def test_reports_invalid_choices_and_rows_the_database_rejects(self):
+        path = self.write('feed.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'external_id': 'C1', 'make': 'Kia', 'model': 'Rio', 'price': '9000', 'year': 2019, 'body': 'седан'},
+            {'external_id': 'C2', 'make': 'Kia', 'model': 'Rio', 'price': '9000', 'year': 2019, 'color': 'зеленый'},
+            {'external_id': 'C3', 'make': 'Kia', 'model': 'Ceed', 'price': '9000', 'year': -1},
+            {'external_id': 'C4', 'make': 'Kia', 'model': 'Soul', 'price': '9000', 'year': 2020, 'gearbox': 'автомат'},
+        ]))
+        out, err = StringIO(), StringIO()
+        call_command('import_cars', path, stdout=out, stderr=err)
+        self.assertIn('2 created, 0 updated, 2 skipped', out.getvalue())
+        self.assertIn('row 2: unknown color: зеленый', err.getvalue())
+        self.assertIn('row 3: CHECK constraint failed', err.getvalue())
+        self.assertEqual(sorted(Car.objects.values_list('external_id', flat=True)), ['C1', 'C4'])
+        self.assertEqual(sorted(CarModel.objects.values_list('car_model', flat=True)), ['Rio', 'Soul'])
+
+
+class ExportTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, make, model, self.cars = create_catalog(3, images=2, reviews=0)
+
+    def test_streams_filtered_ndjson(self):
+        response = self.client.get(reverse('car_export'), {'price__gt': 10000})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [car.pk for car in self.cars[1:]])
+        self.assertEqual(rows[0]['car_make'], 'BMW')
+        self.assertEqual(len(rows[0]['images']), 2)
+        self.assertTrue(rows[0]['images'][0].startswith('http://testserver/media/'))
+
+    @override_settings(STORE_EXPORT_CHUNK_SIZE=2)
+    def test_streams_csv_in_chunks(self):
+        # one cursor over the cars, one images query per chunk of 2 cars
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('car_export'), {'output': 'csv'}, HTTP_ACCEPT='text/csv')
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(len(content.splitlines()), 4)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_cars', '--filter', 'price__lt=10001', stdout=out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [self.cars[0].pk])
+
+
+class CartTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, make, model, self.cars = create_catalog(3, images=2, reviews=1)
+        self.user = Client.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_cart_is_created_for_the_client(self):
+        data = self.client.get(reverse('cart_list')).data
+        self.assertEqual((data['client'], data['cart_item'], data['total_price']), (self.user.pk, [], '0.00'))
+
+    def test_batch_add_and_remove(self):
+        url = reverse('cart_batch')
+        ids = [car.pk for car in self.cars]
+        data = self.client.post(url, {'add': ids + ids[:1]}, format='json').data
+        self.assertEqual([item['car']['id'] for item in data['cart_item']], ids)
+        self.assertEqual(data['total_price'], '30003.00')
+        self.assertEqual(len(data['cart_item'][0]['car']['car_images']), 1)
+
+        data = self.client.post(url, {'remove': ids[:2], 'add': ids[2:]}, format='json').data
+        self.assertEqual([item['car']['id'] for item in data['cart_item']], ids[2:])
+        self.assertEqual(self.client.get(reverse('cart_list')).data['total_price'], '10002.00')
+
+    def test_cart_holds_each_car_once(self):
+        url = reverse('cart_batch')
+        self.client.post(url, {'add': [self.cars[0].pk]}, format='json')
+        data = self.client.post(url, {'add': [self.cars[1].pk, self.cars[0].pk]}, format='json').data
+        self.assertEqual([item['car']['id'] for item in data['cart_item']], [self.cars[0].pk, self.cars[1].pk])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=Cart.objects.get(), car=self.cars[0])
+
+    def test_batch_rejects_unknown_cars(self):
+        response = self.client.post(reverse('cart_batch'), {'add': [999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_owners_have_no_cart(self):
+        owner = Owner.objects.create_user(username='owner', password='pass12345', owner_name='Dealer', location='Bishkek')
+        self.client.force_authenticate(owner)
+        self.assertEqual(self.client.get(reverse('cart_list')).status_code, 403)
+
+
+class HistoryTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, make, model, self.cars = create_catalog(3, images=1, reviews=1)
+        self.user = Client.objects.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_views_are_buffered_and_deduplicated(self):
+        for car in self.cars + self.cars[:1]:
+            self.assertEqual(self.client.get(reverse('car_detail', args=[car.pk])).status_code, 200)
+        self.assertFalse(History.objects.exists())
+
+        with self.assertNumQueries(3):
+            self.assertEqual(recorder.flush(), 3)
+        self.assertEqual(History.objects.filter(client=self.user).count(), 3)
+
+        self.client.get(reverse('car_detail', args=[self.cars[0].pk]))
+        self.assertEqual(recorder.flush(), 0)
+
+    @override_settings(STORE_HISTORY_BATCH_SIZE=2)
+    def test_full_buffer_flushes(self):
+        for car in self.cars:
+            self.client.get(reverse('car_detail', args=[car.pk]))
+        self.assertEqual(History.objects.count(), 2)
+
+    def test_history_lists_own_views_newest_first(self):
+        other = Client.objects.create_user(username='other', password='pass12345')
+        History.objects.create(client=other, car=self.cars[0])
+        for car in self.cars[:2]:
+            self.client.get(reverse('car_detail', args=[car.pk]))
+        recorder.flush()
+        data = self.client.get(reverse('history_list-list')).data['results']
+        self.assertEqual([row['car'] for row in data], [self.cars[1].pk, self.cars[0].pk])
+
+
+class BenchmarkTests(StoreTestCase):
+    def test_scenarios_run_without_errors(self):
+        seed(cars=20)
+        results = run_benchmark(InProcessTransport(), Fixture(), requests=3, warmup=1)
+        self.assertEqual(set(results['scenarios']), set(SCENARIOS))
+        for name, result in results['scenarios'].items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertIsNotNone(result['queries'])
+
+    def test_compare_flags_latency_query_and_error_regressions(self):
+        baseline = {'scenarios': {'car_list': {'p50_ms': 10, 'p95_ms': 20, 'max_queries': 3, 'errors': 0}}}
+        current = {'scenarios': {'car_list': {'p50_ms': 11, 'p95_ms': 20, 'max_queries': 3, 'errors': 0}}}
+        self.assertEqual(compare(baseline, current, tolerance=0.2), [])
+        current['scenarios']['car_list'].update(p95_ms=30, max_queries=4, errors=1)
+        self.assertEqual(len(compare(baseline, current, tolerance=0.2)), 3)
+
+
+class QueryInstrumentationTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        create_catalog(3)
+
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', APIClient().get(reverse('car_list')))
+
+    @override_settings(STORE_SQL_INSTRUMENTATION=True, STORE_SLOW_REQUEST_MS=0, STORE_RESPONSE_CACHE_TIMEOUT=0)
+    def test_server_timing_and_slow_request_log(self):
+        rebuild_cards()
+        with self.assertLogs('store.sql', 'WARNING') as logs:
+            response = APIClient().get(reverse('car_list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries, 0 duplicates", total;dur=[\d.]+$')
+        stats = logs.records[0].request_stats
+        self.assertEqual((stats['status'], stats['queries'], stats['duplicates']), (200, 3, []))
+        self.assertEqual(len(stats['slowest']), 3)
+
+    def test_duplicates_are_grouped(self):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            for car in Car.objects.all():
+                Car.objects.filter(pk=car.pk).exists()
+                Car.objects.filter(pk=car.pk).exists()
+        self.assertEqual((stats.count, stats.duplicates), (7, 3))
+        self.assertEqual([row['count'] for row in stats.duplicated()], [2, 2, 2])
+
+
+class CachedAuthenticationTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = Client.objects.create_user(username='client', password='pass12345')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_user_is_resolved_once_as_the_concrete_model(self):
+        with self.assertNumQueries(1):
+            user = get_cached_user(self.user.pk)
+        self.assertIsInstance(user, Client)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_user(self.user.pk).username, 'client')
+
+    def test_authentication_adds_no_queries_once_cached(self):
+        self.client.get(reverse('history_list-list'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('history_list-list')).status_code, 200)
+
+    def test_saving_the_profile_invalidates(self):
+        get_cached_user(self.user.pk)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(get_cached_user(self.user.pk).first_name, 'Renamed')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('history_list-list')).status_code, 401)
+
+
+class TokenBlacklistTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        blacklist.reset()
+        self.user = Client.objects.create_user(username='client', password='pass12345')
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def test_refresh_skips_the_blacklist_table_for_unknown_tokens(self):
+        blacklist.get_filter()
+        get_cached_user(self.user.pk)
+        with self.assertNumQueries(1):
+            response = APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.data)
+
+    def test_blacklisted_tokens_are_rejected(self):
+        APIClient().post(reverse('logout'), {'refresh': str(self.refresh)}, format='json')
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        blacklist.reset()
+        self.assertIn(self.refresh['jti'], blacklist)
+
+    def test_tokens_revoked_through_the_orm_are_rejected_at_once(self):
+        blacklist.get_filter()
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=self.refresh['jti']))
+        response = APIClient().post(reverse('token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocations_are_added_without_rebuilding_the_filter(self):
+        blacklist.get_filter()
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=self.refresh['jti']))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn(self.refresh['jti'], blacklist)
+        self.assertIn('"blacklisted_at" >=', queries[0]['sql'])
+        self.assertNotIn('"expires_at"', queries[0]['sql'])
+
+    def test_compact_tokens_removes_only_expired(self):
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+        call_command('compact_tokens', chunk_size=1, stdout=StringIO())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [self.refresh['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class AsyncViewTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category, self.make, self.model, self.cars = create_catalog(3)
+        self.client = APIClient()
+
+    def assertSameAsSync(self, name, *args, query=''):
+        sync = self.client.get(reverse(name, args=args) + query)
+        cache.clear()
+        response = self.client.get(reverse(f'async_{name}', args=args) + query)
+        self.assertEqual(response.status_code, sync.status_code)
+        self.assertEqual(json.loads(response.content.replace(b'/async/', b'/')), sync.json())
+
+    def test_lists_match_sync_views(self):
+        self.assertSameAsSync('car_list', query='?ordering=-price&offset=1')
+        self.assertSameAsSync('car_list', query='?search=BMW&price__gt=10000')
+        self.assertSameAsSync('car_list', query='?pagination=cursor')
+        self.assertSameAsSync('car_list', query='?year__gt=abc')
+        self.assertSameAsSync('car_list', query='?fields=id,car_images&expand=')
+        self.assertSameAsSync('car_list', query='?fields=nope')
+        self.assertSameAsSync('car_make_list')
+        self.assertSameAsSync('car_model_list')
+        self.assertSameAsSync('category_list')
+
+    def test_details_match_sync_views(self):
+        self.assertSameAsSync('car_detail', self.cars[0].pk)
+        self.assertSameAsSync('car_detail', 999)
+        self.assertSameAsSync('car_detail', self.cars[0].pk, query='?fields=price,car_review&expand=')
+        self.assertSameAsSync('car_make_detail', self.make.pk)
+        self.assertSameAsSync('car_model_detail', self.model.pk)
+        self.assertSameAsSync('category_detail', self.category.pk)
+
+    def test_run_authentication_permissions_and_negotiation(self):
+        with mock.patch.object(CarDetailAPIView, 'permission_classes', [IsAuthenticated]):
+            self.assertSameAsSync('car_detail', self.cars[0].pk)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertSameAsSync('car_list')
+        self.client.credentials()
+        response = self.client.get(reverse('async_car_list') + '?format=api')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertEqual(self.client.get(reverse('async_car_list'), HTTP_ACCEPT='text/csv').status_code, 406)
+
+    def test_detail_is_cached_and_recorded_in_history(self):
+        user = Client.objects.get(username='client0')
+        self.client.force_authenticate(user)
+        url = reverse('async_car_detail', args=[self.cars[0].pk])
+        first = self.client.get(url).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), first)
+        self.assertSameAsSync('car_detail', self.cars[0].pk)
+        recorder.flush()
+        self.assertEqual(list(History.objects.values_list('client', 'car')), [(user.pk, self.cars[0].pk)])
+
+
+class FuelBitmaskTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, make, model, self.cars = create_catalog(4, images=0, reviews=0)
+        for car, fuel in zip(self.cars, [['бензин'], ['бензин', 'гибрид'], ['электро'], ['дизель', 'газ']]):
+            car.fuel = fuel
+            car.save()
+
+    def filtered(self, query):
+        data = self.client.get(reverse('car_list') + query + '&limit=10').json()
+        return sorted(row['id'] for row in data['results'])
+
+    def test_values_round_trip_as_lists(self):
+        car = Car.objects.get(pk=self.cars[1].pk)
+        self.assertEqual(car.fuel, ['бензин', 'гибрид'])
+        self.assertEqual(Car.objects.filter(pk=car.pk).values_list('fuel', flat=True).get(), ['бензин', 'гибрид'])
+        data = self.client.get(reverse('car_detail', args=[car.pk])).data
+        self.assertEqual(data['fuel'], ['бензин', 'гибрид'])
+
+    def test_single_values_are_rendered_bare(self):
+        self.assertEqual(self.client.get(reverse('car_detail', args=[self.cars[0].pk])).json()['fuel'], 'бензин')
+        content = b''.join(self.client.get(reverse('car_export')).streaming_content)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['fuel'] for row in rows[:2]], ['бензин', ['бензин', 'гибрид']])
+        content = b''.join(self.client.get(reverse('car_export'), {'output': 'csv'}).streaming_content).decode()
+        self.assertIn(',бензин|гибрид,', content)
+        serializer = CarSerializer(self.cars[2], data={'fuel': 'газ'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.save().fuel, ['газ'])
+
+    def test_any_of_and_all_of_filters(self):
+        ids = [car.pk for car in self.cars]
+        self.assertEqual(self.filtered('?fuel=гибрид&fuel=электро'), ids[1:3])
+        self.assertEqual(self.filtered('?fuel=бензин'), ids[:2])
+        self.assertEqual(self.filtered('?fuel__all=бензин&fuel__all=гибрид'), ids[1:2])
+        self.assertEqual(self.client.get(reverse('car_list') + '?fuel=уголь').status_code, 400)
+
+    def test_filter_is_an_indexed_in_lookup(self):
+        queryset = CarFilter({'fuel': ['гибрид']}, queryset=Car.objects.all()).qs
+        self.assertIn('"store_car"."fuel" IN (', str(queryset.query))
+        self.assertIn('store_car_fuel', queryset.explain())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class CarQueryPlanTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        category, self.make, self.model, cars = create_catalog(30, images=1, reviews=1)
+
+    def full_scans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if detail.startswith('SCAN store_car') and 'USING' not in detail and 'VIRTUAL' not in detail:
+                        scans.append((detail, query['sql']))
+        return scans
+
+    def test_canonical_car_list_queries_use_indexes(self):
+        base = reverse('car_list')
+        urls = [
+            f'{base}?car_make={self.make.pk}&ordering=price',
+            f'{base}?car_model={self.model.pk}',
+            f'{base}?year__gt=2016&year__lt=2020',
+            f'{base}?price__gt=10005&price__lt=10020&ordering=-price',
+            f'{base}?ordering=price',
+            f'{base}?ordering=-review_count',
+            f'{base}?fuel=гибрид&fuel=электро',
+            f'{base}?pagination=cursor',
+            f'{base}?pagination=cursor&ordering=-review_count&limit=1',
+            f'{base}?pagination=cursor&ordering=price',
+        ]
+        next_page = self.client.get(urls[-1]).data['next']
+        urls.append(next_page.replace('http://testserver', ''))
+        self.assertTrue(self.full_scans(f'{base}?ordering=-rating'))
+        for url in urls:
+            self.assertEqual(self.full_scans(url), [], url)
+
+
+class ReplicaRouterTests(StoreTestCase):
+    def test_reads_stay_on_the_primary_outside_replica_requests(self):
+        router = PrimaryReplicaRouter()
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            self.assertEqual(router.db_for_read(Car), 'default')
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Car), 'replica')
+                self.assertEqual(router.db_for_write(Car), 'default')
+        with override_settings(DATABASE_REPLICAS=[]), replica_reads():
+            self.assertEqual(router.db_for_read(Car), 'default')
+
+    def test_replicas_require_a_shared_cache(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir()}}
+        with override_settings(DATABASE_REPLICAS=[], CACHES=local):
+            check_writer_cache()
+        with override_settings(DATABASE_REPLICAS=['replica'], CACHES=shared):
+            check_writer_cache()
+        with override_settings(DATABASE_REPLICAS=['replica'], CACHES=local):
+            self.assertRaises(ImproperlyConfigured, check_writer_cache)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'run with --settings=carproject.settings_replica')
+@override_settings(STORE_RESPONSE_CACHE_TIMEOUT=0, DATABASE_REPLICAS=settings.DATABASE_REPLICAS)
+class ReplicaRoutingTests(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        Category.objects.create(category_name='primary')
+        Category.objects.using('replica').create(category_name='replica')
+
+    def category_names(self, client):
+        return [row['category_name'] for row in client.get(reverse('category_list')).data['results']]
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.category_names(APIClient()), ['replica'])
+
+    def test_writes_go_to_the_primary_and_stick_to_it(self):
+        client = APIClient()
+        response = client.post(reverse('client_register'), {'username': 'new', 'password': 'pass12345'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Client.objects.using('default').filter(username='new').exists())
+        self.assertFalse(Client.objects.using('replica').filter(username='new').exists())
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.category_names(client), ['primary'])
+
+    def test_authenticated_writers_read_their_writes(self):
+        category, make, model, cars = create_catalog(1, images=0, reviews=0)
+        user = Client.objects.create_user(username='writer', password='pass12345')
+        token = f'Bearer {RefreshToken.for_user(user).access_token}'
+        writer = APIClient()
+        writer.credentials(HTTP_AUTHORIZATION=token)
+        self.assertEqual(writer.post(reverse('cart_batch'), {'add': [cars[0].pk]}, format='json').status_code, 200)
+
+        other_device = APIClient()
+        other_device.credentials(HTTP_AUTHORIZATION=token)
+        self.assertEqual(self.category_names(other_device), ['primary', category.category_name])
+        self.assertEqual(self.category_names(APIClient()), ['replica'])
@@ -0,0 +1,143 @@
+import hashlib
+import time
+from datetime import timedelta
+from threading import Lock
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from .authentication import get_cached_user
+from .cache import get_tag_versions
+
+
+BLACKLIST_TAG = 'blacklist'
+
+
+class BloomFilter:
+    def __init__(self, bits, hashes):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray((bits + 7) // 8)
+
+    def positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.array[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+
+class Blacklist:
+    """
+    Per-process front for BlacklistedToken lookups.
+
+    A Bloom filter over the jti of every unexpired blacklisted token answers most lookups
+    without a query; only filter hits are confirmed against the database. Committing a
+    BlacklistedToken anywhere (a logout, the admin, another worker) bumps the shared
+    `blacklist` tag, and every lookup checks that tag first. When it has changed, the
+    filter adds the tokens blacklisted since its last update, looking back
+    STORE_BLACKLIST_BLOOM_OVERLAP seconds further for transactions that committed late.
+    Every STORE_BLACKLIST_BLOOM_REFRESH seconds the filter is rebuilt from scratch,
+    which drops expired tokens.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._filter = None
+        self._built = 0
+        self._generation = None
+        self._since = None
+
+    def get_filter(self):
+        refresh = getattr(settings, 'STORE_BLACKLIST_BLOOM_REFRESH', 300)
+        overlap = timedelta(seconds=getattr(settings, 'STORE_BLACKLIST_BLOOM_OVERLAP', 60))
+        generation = get_tag_versions([BLACKLIST_TAG])[BLACKLIST_TAG]
+        with self._lock:
+            now = aware_utcnow()
+            if self._filter is None or time.monotonic() - self._built > refresh:
+                bloom = BloomFilter(
+                    getattr(settings, 'STORE_BLACKLIST_BLOOM_BITS', 2 ** 20),
+                    getattr(settings, 'STORE_BLACKLIST_BLOOM_HASHES', 7),
+                )
+                self.add_rows(bloom, BlacklistedToken.objects.filter(token__expires_at__gt=now))
+                self._filter, self._built = bloom, time.monotonic()
+            elif generation != self._generation:
+                self.add_rows(self._filter, BlacklistedToken.objects.filter(blacklisted_at__gte=self._since))
+            else:
+                return self._filter
+            self._generation, self._since = generation, now - overlap
+            return self._filter
+
+    @staticmethod
+    def add_rows(bloom, queryset):
+        for jti in queryset.values_list('token__jti', flat=True).iterator(chunk_size=5000):
+            bloom.add(jti)
+
+    def add(self, jti):
+        """Add a token this process has just blacklisted, before other processes hear of it."""
+        self.get_filter().add(jti)
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+
+    def __contains__(self, jti):
+        return jti in self.get_filter() and BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+blacklist = Blacklist()
+
+
+class RefreshToken(BaseRefreshToken):
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in blacklist:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+    def outstand(self):
+        return OutstandingToken.objects.create(
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            jti=self.payload[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        )
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            user = get_cached_user(user_id)
+            if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
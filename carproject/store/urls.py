@@ -1,11 +1,14 @@
 from django.urls import path, include
 from .views import (
     UserProfileViewSet, ClientViewSet, OwnerViewSet, CarMakeLisAPIView, CarMakeDetailAPIView,
-    CarModelListAPIView, CarModelDetailAPIView, CategoryListAPIView, CategoryDetailAPIView, CarCreateAPIView, CarListAPIView, CarDetailAPIView,
-    CarReviewCreateAPIView, CarReviewEditAPIView, CartListAPIView, CartItemDetailAPIView, FavoriteListAPIView, FavoriteItemDetailAPIView, HistoryViewSet,
+    CarModelListAPIView, CarModelDetailAPIView, CategoryListAPIView, CategoryDetailAPIView, CarCreateAPIView, CarListAPIView, CarFacetsAPIView, CarExportAPIView, CarDetailAPIView,
+    CarReviewCreateAPIView, CarReviewEditAPIView, CartListAPIView, CartBatchAPIView, CartItemDetailAPIView, FavoriteListAPIView, FavoriteItemDetailAPIView, HistoryViewSet,
     OwnerRegisterView, ClientRegisterView, LoginView, LogoutView,
+    CategoryMakeListAPIView, CategoryModelListAPIView, CarMakeCarListAPIView, CarMakeModelListAPIView, CarModelCarListAPIView,
 )
 from rest_framework import routers
+from . import async_views
+from rest_framework_simplejwt.views import TokenRefreshView
 
 router = routers.SimpleRouter()
 router.register(r'users', UserProfileViewSet, basename='user_list')
@@ -19,22 +22,39 @@ urlpatterns = [
     path('', include(router.urls)),
     path('category/', CategoryListAPIView.as_view(), name='category_list'),
     path('category/<int:pk>/', CategoryDetailAPIView.as_view(), name='category_detail'),
+    path('category/<int:pk>/makes/', CategoryMakeListAPIView.as_view(), name='category_makes'),
+    path('category/<int:pk>/models/', CategoryModelListAPIView.as_view(), name='category_models'),
 
     path('car_make/', CarMakeLisAPIView.as_view(), name='car_make_list'),
     path('car_make/<int:pk>/', CarMakeDetailAPIView.as_view(), name='car_make_detail'),
+    path('car_make/<int:pk>/cars/', CarMakeCarListAPIView.as_view(), name='car_make_cars'),
+    path('car_make/<int:pk>/models/', CarMakeModelListAPIView.as_view(), name='car_make_models'),
 
     path('car_model/', CarModelListAPIView.as_view(), name='car_model_list'),
     path('car_model/<int:pk>/', CarModelDetailAPIView.as_view(), name='car_model_detail'),
+    path('car_model/<int:pk>/cars/', CarModelCarListAPIView.as_view(), name='car_model_cars'),
 
     path('car_create/', CarCreateAPIView.as_view(), name='car_create'),
     path('car/', CarListAPIView.as_view(), name='car_list'),
+    path('car/facets/', CarFacetsAPIView.as_view(), name='car_facets'),
+    path('car/export/', CarExportAPIView.as_view(), name='car_export'),
     path('car/<int:pk>/', CarDetailAPIView.as_view(), name='car_detail'),
 
+    path('async/category/', async_views.category_list, name='async_category_list'),
+    path('async/category/<int:pk>/', async_views.category_detail, name='async_category_detail'),
+    path('async/car_make/', async_views.car_make_list, name='async_car_make_list'),
+    path('async/car_make/<int:pk>/', async_views.car_make_detail, name='async_car_make_detail'),
+    path('async/car_model/', async_views.car_model_list, name='async_car_model_list'),
+    path('async/car_model/<int:pk>/', async_views.car_model_detail, name='async_car_model_detail'),
+    path('async/car/', async_views.car_list, name='async_car_list'),
+    path('async/car/<int:pk>/', async_views.car_detail, name='async_car_detail'),
+
     path('review/', CarReviewCreateAPIView.as_view(), name='review_list'),
     path('review/<int:pk>/', CarReviewEditAPIView.as_view(), name='review_edit'),
 
     path('cart/', CartListAPIView.as_view(), name='cart_list'),
-    path('cart_item/', CartItemDetailAPIView.as_view(), name='cart_item_detail'),
+    path('cart/items/', CartBatchAPIView.as_view(), name='cart_batch'),
+    path('cart_item/<int:pk>/', CartItemDetailAPIView.as_view(), name='cart_item_detail'),
 
     path('favorite/', FavoriteListAPIView.as_view(), name='favorite_list'),
     path('favorite_item/', FavoriteItemDetailAPIView.as_view(), name='favorite_item_detail'),
@@ -42,6 +62,7 @@ urlpatterns = [
     path('owner_register/', OwnerRegisterView.as_view(), name='owner_register'),
     path('client_register/', ClientRegisterView.as_view(), name='client_register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('logout/', LogoutView.as_view(), name='logout')
 
 ]
\ No newline at end of file
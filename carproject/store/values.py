@@ -0,0 +1,149 @@
+"""
+Read-only list serialization from `.values_list()` rows.
+
+A ModelSerializer builds model instances and walks a tree of field objects for every
+row. The serializers here read named tuples instead and build the same dicts in one
+loop, with the images of a page grouped from a single query, so a list endpoint's
+output stays byte-identical to its ModelSerializer while costing a fraction of the CPU
+per row. Scalar values that need formatting go through the ModelSerializer's own field.
+"""
+from collections import defaultdict
+from functools import cached_property
+
+from rest_framework.response import Response
+
+from .fieldsets import CarFieldPlan
+from .images import stored_variant_url
+from .models import CarImage
+from .serializers import (
+    CarImageListSerializer, CarListSerializer, CarMakeListSerializer, CarModelListSerializer, CategoryListSerializer,
+)
+
+
+class ValuesSerializer:
+    """Flat serializer: every field of `serializer_class` is a column read as is."""
+    serializer_class = None
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.using = None
+
+    @cached_property
+    def serializer(self):
+        return self.serializer_class(context=self.context)
+
+    def get_values(self):
+        return self.serializer_class.Meta.fields
+
+    def rows(self, queryset):
+        # pin the images to the database the rows come from
+        self.using = queryset.db
+        queryset = queryset.using(self.using).select_related(None).prefetch_related(None)
+        if not queryset.ordered:
+            # without it the database may read a covering index and return rows in another order
+            queryset = queryset.order_by('pk')
+        return queryset.values_list(*self.get_values(), named=True)
+
+    def to_representation(self, rows):
+        fields = self.serializer_class.Meta.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+
+class CategoryListValuesSerializer(ValuesSerializer):
+    serializer_class = CategoryListSerializer
+
+
+class CarMakeListValuesSerializer(ValuesSerializer):
+    serializer_class = CarMakeListSerializer
+
+
+class CarModelListValuesSerializer(ValuesSerializer):
+    serializer_class = CarModelListSerializer
+
+
+class CarListValuesSerializer(ValuesSerializer):
+    serializer_class = CarListSerializer
+
+    def get_values(self):
+        plan = self.context.get('car_fields') or CarFieldPlan()
+        # price, date_registered and review_count are also read by cursor pagination
+        values = ['id', 'car_make_id', 'car_model_id', 'year', 'price', 'date_registered', 'review_count']
+        if plan.expands('car_make'):
+            values.append('car_make__car_name')
+        if plan.expands('car_model'):
+            values.append('car_model__car_model')
+        return values
+
+    def get_images(self, car_ids, expand=True):
+        rows = CarImage.objects.using(self.using).filter(car_id__in=car_ids)
+        images = defaultdict(list)
+        if not expand:
+            for car_id, pk in rows.values_list('car_id', 'id'):
+                images[car_id].append(pk)
+            return images
+        size, image_format = CarImageListSerializer(context=self.context).get_variant_options()
+        storage = CarImage._meta.get_field('image').storage
+        request = self.context.get('request')
+        for car_id, pk, name, variants in rows.values_list('car_id', 'id', 'image', 'variants'):
+            images[car_id].append({
+                'id': pk, 'image': stored_variant_url(storage, name, variants, size, image_format, request),
+            })
+        return images
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        plan = self.context.get('car_fields')
+        if plan is not None:
+            return self.to_sparse_representation(rows, plan)
+        images = self.get_images([row.id for row in rows])
+        price = self.serializer.fields['price'].to_representation
+        return [{
+            'id': row.id,
+            'car_make': {'id': row.car_make_id, 'car_name': row.car_make__car_name},
+            'car_model': {'id': row.car_model_id, 'car_model': row.car_model__car_model},
+            'car_images': images.get(row.id, []),
+            'year': row.year,
+            'price': price(row.price),
+        } for row in rows]
+
+    def to_sparse_representation(self, rows, plan):
+        images = {}
+        if plan.includes('car_images'):
+            images = self.get_images([row.id for row in rows], plan.expands('car_images'))
+        columns = {
+            'id': lambda row: row.id,
+            'car_make': lambda row: row.car_make_id,
+            'car_model': lambda row: row.car_model_id,
+            'car_images': lambda row: images.get(row.id, []),
+            'year': lambda row: row.year,
+        }
+        if plan.expands('car_make'):
+            columns['car_make'] = lambda row: {'id': row.car_make_id, 'car_name': row.car_make__car_name}
+        if plan.expands('car_model'):
+            columns['car_model'] = lambda row: {'id': row.car_model_id, 'car_model': row.car_model__car_model}
+        if plan.includes('price'):
+            price = self.serializer.fields['price'].to_representation
+            columns['price'] = lambda row: price(row.price)
+        names = [name for name in self.serializer_class.Meta.fields if plan.includes(name)]
+        return [{name: columns[name](row) for name in names} for row in rows]
+
+
+VALUES_SERIALIZERS = {
+    values_serializer_class.serializer_class: values_serializer_class for values_serializer_class in [
+        CategoryListValuesSerializer, CarMakeListValuesSerializer, CarModelListValuesSerializer,
+        CarListValuesSerializer,
+    ]
+}
+
+
+class ValuesListMixin:
+    """ListAPIView mixin that serves list() through `values_serializer_class`."""
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        rows = serializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(rows))
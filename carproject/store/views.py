@@ -1,22 +1,48 @@
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from rest_framework import viewsets, generics, status
+from django.db import transaction
+from django.db.models import Prefetch
 from .models import (
     UserProfile, Client, Owner, CarMake, CarModel, Category, Car,
-    CarReview, Cart, CartItem, Favorite, FavoriteItem, History
+    CarImage, CarReview, Cart, CartItem, Favorite, FavoriteItem, History
 )
 from .serializers import (
     UserProfileSerializer, ClientSerializer, OwnerSerializer, CarMakeListSerializer, CarMakeDetailSerializer,
     CarModelListSerializer, CarModelDetailSerializer, CategoryListSerializer, CategoryDetailSerializer, CarSerializer, CarListSerializer, CarDetailSerializer,
     CarReviewSerializer, CarReviewCreateSerializer, OwnerRegisterSerializer, ClientRegisterSerializer, LoginSerializer,
-    CartSerializer, CartItemSerializer, FavoriteSerializer, FavoriteItemSerializer, HistorySerializer,
+    CartSerializer, CartItemSerializer, CartBatchSerializer, FavoriteSerializer, FavoriteItemSerializer, HistorySerializer,
+    CartCarSerializer, nested_page,
 )
 from .filters import *
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .permission import *
+from .pagination import CarCursorPagination
+from .search import CarSearchFilter
+from .facets import compute_facets, get_cached_facets
+from .cache import CachedResponseMixin
+from .history import recorder
+from .fieldsets import CarFieldsViewMixin
+from .cards import CarCardRenderer, get_cards, with_card_renderer
+from .values import (
+    CarListValuesSerializer, CarMakeListValuesSerializer, CarModelListValuesSerializer, CategoryListValuesSerializer,
+    ValuesListMixin,
+)
+from .routers import use_primary
+from .export import CONTENT_TYPES, WRITERS, export_queryset, export_rows
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils.translation import get_language
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.settings import api_settings
+
+
+def car_list_queryset():
+    return Car.objects.with_rating().select_related('car_make', 'car_model').prefetch_related('car_images')
 
 class OwnerRegisterView(generics.CreateAPIView):
     serializer_class = OwnerRegisterSerializer
@@ -87,60 +113,216 @@ class OwnerViewSet(viewsets.ModelViewSet):
         return UserProfile.objects.filter(id=self.request.user.id)
 
 
-class CarMakeLisAPIView(generics.ListAPIView):
+class CarMakeLisAPIView(CachedResponseMixin, ValuesListMixin, generics.ListAPIView):
+    cache_tags = ['car_make']
     queryset = CarMake.objects.all()
     serializer_class = CarMakeListSerializer
+    values_serializer_class = CarMakeListValuesSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
-    search_fields = ['category_name']
+    search_fields = ['car_name']
 
 
-class CarMakeDetailAPIView(generics.RetrieveAPIView):
+class CarMakeDetailAPIView(CarFieldsViewMixin, CachedResponseMixin, generics.RetrieveAPIView):
+    cache_tags = ['car_make:{pk}']
     queryset = CarMake.objects.all()
     serializer_class = CarMakeDetailSerializer
+    car_fields_serializer_class = CarListSerializer
+
+    def get_dependency_tags(self):
+        return {f'car_model:{pk}' for pk in nested_page(self.object.makes).values_list('car_model_id', flat=True)}
 
 
-class CarModelListAPIView(generics.ListAPIView):
+class CarModelListAPIView(CachedResponseMixin, ValuesListMixin, generics.ListAPIView):
+    cache_tags = ['car_model']
     queryset = CarModel.objects.all()
     serializer_class = CarModelListSerializer
+    values_serializer_class = CarModelListValuesSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
-    search_fields = ['category_name']
+    search_fields = ['car_model']
 
-class CarModelDetailAPIView(generics.RetrieveAPIView):
+class CarModelDetailAPIView(CarFieldsViewMixin, CachedResponseMixin, generics.RetrieveAPIView):
+    cache_tags = ['car_model:{pk}']
     queryset = CarModel.objects.all()
     serializer_class = CarModelDetailSerializer
+    car_fields_serializer_class = CarListSerializer
+
+    def get_dependency_tags(self):
+        return {f'car_make:{pk}' for pk in nested_page(self.object.model).values_list('car_make_id', flat=True)}
 
 
 
-class CategoryListAPIView(generics.ListAPIView):
+class CategoryListAPIView(CachedResponseMixin, ValuesListMixin, generics.ListAPIView):
+    cache_tags = ['category']
     queryset = Category.objects.all()
     serializer_class = CategoryListSerializer
+    values_serializer_class = CategoryListValuesSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     search_fields = ['category_name']
 
-class CategoryDetailAPIView(generics.RetrieveAPIView):
+class CategoryDetailAPIView(CachedResponseMixin, generics.RetrieveAPIView):
+    cache_tags = ['category:{pk}']
     queryset = Category.objects.all()
     serializer_class = CategoryDetailSerializer
 
 
+class NestedListMixin:
+    """The objects of one parent (`parent_model` by the `pk` URL kwarg), ordered by id by default."""
+    parent_model = None
+    parent_field = None
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**{self.parent_field: self.kwargs['pk']}).order_by('pk')
+
+    def list(self, request, *args, **kwargs):
+        if not self.parent_model.objects.filter(pk=self.kwargs['pk']).exists():
+            raise Http404(f'No {self.parent_model._meta.object_name} matches the given query.')
+        return super().list(request, *args, **kwargs)
+
+
+class CategoryMakeListAPIView(NestedListMixin, CarMakeLisAPIView):
+    parent_model = Category
+    parent_field = 'category_id'
+
+
+class CategoryModelListAPIView(NestedListMixin, CarModelListAPIView):
+    parent_model = Category
+    parent_field = 'category_id'
+
+
+class CarMakeModelListAPIView(NestedListMixin, CarModelListAPIView):
+    parent_model = CarMake
+    parent_field = 'car_make_id'
+
+
 class CarCreateAPIView(generics.CreateAPIView):
     queryset = Car.objects.all()
     serializer_class = CarListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-class CarListAPIView(generics.ListAPIView):
-    queryset = Car.objects.all()
+class CarListAPIView(CarFieldsViewMixin, ValuesListMixin, generics.ListAPIView):
+    queryset = car_list_queryset()
     serializer_class = CarListSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    values_serializer_class = CarListValuesSerializer
+    car_fields_serializer_class = CarListSerializer
+    filter_backends = [DjangoFilterBackend, CarSearchFilter, OrderingFilter]
+    filterset_class = CarFilter
+    search_fields = ['car_make__car_name', 'car_model__car_model', 'description']
+    ordering_fields = ['price', 'rating', 'review_count']
+    renderer_classes = with_card_renderer(api_settings.DEFAULT_RENDERER_CLASSES)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and CarCursorPagination.is_requested(self.request):
+            self._paginator = CarCursorPagination()
+        return super().paginator
+
+    def reads_rating(self):
+        params = self.request.query_params
+        orderings = [name.strip().lstrip('-') for name in params.get(api_settings.ORDERING_PARAM, '').split(',')]
+        return 'rating' in orderings or 'rating__gt' in params or 'rating__lt' in params
+
+    def uses_cards(self):
+        params = self.request.query_params
+        return (
+            isinstance(self.request.accepted_renderer, CarCardRenderer) and self.paginator is not None
+            and 'image_size' not in params and 'image_format' not in params and self.get_car_fields() is None
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.uses_cards():
+            return super().list(request, *args, **kwargs)
+        if not self.reads_rating():
+            # a card page only reads ids and the pagination keys, so skip the rating expression
+            self.queryset = Car.objects.all()
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.select_related(None).prefetch_related(None) \
+            .only('id', 'price', 'date_registered', 'review_count')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(get_cards([car.pk for car in page], get_language()))
+
+
+class CarMakeCarListAPIView(NestedListMixin, CarListAPIView):
+    parent_model = CarMake
+    parent_field = 'car_make_id'
+
+
+class CarModelCarListAPIView(NestedListMixin, CarListAPIView):
+    parent_model = CarModel
+    parent_field = 'car_model_id'
+
+
+class CarFacetsAPIView(generics.GenericAPIView):
+    queryset = Car.objects.with_rating()
+    filter_backends = [DjangoFilterBackend, CarSearchFilter]
     filterset_class = CarFilter
-    search_fields = ['car_model', 'car_make']
-    ordering_fields = ['price']
+    search_fields = CarListAPIView.search_fields
 
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if request.query_params:
+            return Response(compute_facets(queryset))
+        return Response(get_cached_facets(queryset))
 
-class CarDetailAPIView(generics.RetrieveAPIView):
-    queryset = Car.objects.all()
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class CarExportAPIView(generics.GenericAPIView):
+    queryset = Car.objects.with_rating()
+    filter_backends = [DjangoFilterBackend, CarSearchFilter]
+    filterset_class = CarFilter
+    search_fields = CarListAPIView.search_fields
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in WRITERS:
+            raise ValidationError({'output': [f'Choose one of: {", ".join(WRITERS)}']})
+        queryset = export_queryset(self.filter_queryset(self.get_queryset()))
+        rows = export_rows(
+            queryset, build_url=request.build_absolute_uri,
+            chunk_size=getattr(settings, 'STORE_EXPORT_CHUNK_SIZE', 2000),
+        )
+        response = StreamingHttpResponse(WRITERS[output](rows), content_type=CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="cars.{output}"'
+        return response
+
+
+class CarDetailAPIView(CarFieldsViewMixin, CachedResponseMixin, generics.RetrieveAPIView):
+    cache_tags = ['car:{pk}']
+    queryset = car_list_queryset().prefetch_related(
+        Prefetch('car_review', queryset=CarReview.objects.select_related('user')),
+    )
     serializer_class = CarDetailSerializer
+    car_fields_serializer_class = CarDetailSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        plan = self.get_car_fields()
+        if plan is None:
+            return super().get_queryset()
+        return plan.car_queryset(Car.objects.with_rating())
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and request.user.is_authenticated:
+            recorder.record(request.user.pk, kwargs['pk'])
+        return response
+
+    def get_dependency_tags(self):
+        car = self.object
+        plan = self.get_car_fields()
+        reviews = car.car_review.all() if plan is None or plan.expands('car_review') else []
+        return {
+            f'car_make:{car.car_make_id}', f'car_model:{car.car_model_id}',
+            *(f'user:{review.user_id}' for review in reviews),
+        }
+
 
 class CarReviewCreateAPIView(generics.ListCreateAPIView):
     queryset = CarReview.objects.all()
@@ -153,17 +335,63 @@ class CarReviewEditAPIView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
-class CartListAPIView(generics.ListAPIView):
-    queryset = Cart.objects.all()
+def cart_item_queryset(plan=None):
+    if plan is not None:
+        return plan.car_queryset(CartItem.objects.all(), prefix='car__', first_image=True)
+    return CartItem.objects.select_related('car__car_make', 'car__car_model').prefetch_related(
+        Prefetch('car__car_images', queryset=CarImage.objects.order_by('pk')[:1], to_attr='first_images'),
+    )
+
+
+class ClientCartMixin(CarFieldsViewMixin):
+    permission_classes = [permissions.IsAuthenticated, IsClient]
+    car_fields_serializer_class = CartCarSerializer
+
+    def get_cart(self):
+        use_primary()
+        queryset = Cart.objects.with_total_price().prefetch_related(
+            Prefetch('cart_item', queryset=cart_item_queryset(self.get_car_fields())),
+        )
+        cart = queryset.filter(client_id=self.request.user.pk).first()
+        if cart is None:
+            Cart.objects.get_or_create(client_id=self.request.user.pk)
+            cart = queryset.get(client_id=self.request.user.pk)
+        return cart
+
+
+class CartListAPIView(ClientCartMixin, generics.RetrieveAPIView):
     serializer_class = CartSerializer
 
+    def get_object(self):
+        return self.get_cart()
 
-    def retrieve(self, request, *args, **kwargs ):
-        cart, created = Cart.objects.get_or_create(user=request.user)
 
-class CartItemDetailAPIView(generics.RetrieveDestroyAPIView):
-    queryset = CartItem.objects.all()
+class CartBatchAPIView(ClientCartMixin, generics.GenericAPIView):
+    serializer_class = CartBatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            # the row lock serializes concurrent batches on one cart
+            cart, created = Cart.objects.select_for_update().get_or_create(client_id=request.user.pk)
+            remove = serializer.validated_data['remove']
+            if remove:
+                cart.cart_item.filter(car_id__in=remove).delete()
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, car_id=car_id) for car_id in serializer.validated_data['add']],
+                ignore_conflicts=True,
+            )
+        return Response(CartSerializer(self.get_cart(), context=self.get_serializer_context()).data)
+
+
+class CartItemDetailAPIView(CarFieldsViewMixin, generics.RetrieveDestroyAPIView):
     serializer_class = CartItemSerializer
+    car_fields_serializer_class = CartCarSerializer
+    permission_classes = [permissions.IsAuthenticated, IsClient]
+
+    def get_queryset(self):
+        return cart_item_queryset(self.get_car_fields()).filter(cart__client_id=self.request.user.pk)
 
 class FavoriteListAPIView(generics.ListAPIView):
     queryset = Favorite.objects.all()
@@ -176,6 +404,7 @@ class FavoriteItemDetailAPIView(generics.RetrieveDestroyAPIView):
 class HistoryViewSet(viewsets.ModelViewSet):
     queryset = History.objects.all()
     serializer_class = HistorySerializer
+    permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return UserProfile.objects.filter(user=self.request.user)
+        return History.objects.filter(client_id=self.request.user.pk).order_by('-date')